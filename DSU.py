@@ -1,48 +1,63 @@
 # Disjoint Set Union (DSU) Datastructure for
 # Randomized Krukal's implementation
 
-import collections
+import array
 import typing
 
-# Creating type for a generic default key dict implementation
-K = typing.TypeVar('K')
-V = typing.TypeVar('V')
-
-# Subclassing of typing.Generic is required inorder to be able to 
-# pass in type hints during variable declarations
-class DefaultKeyDict(collections.defaultdict, typing.Generic[K, V]):
+class DisjointSet:
     """
-    We create our our default dict class so that we can pass in factory
-    functions that work on keys, by default the key func doesnt take any arguments
+    Array backed DSU over flat cell indices `x * N + y` of a M x N grid.
+    Parents and ranks are preallocated for every cell upfront.
     """
-    def __init__(self, key_func: typing.Callable[[K], V]) -> None:
-        super().__init__()
-        self.key_func = key_func
-
-    def __missing__(self, key: K) -> V:
-        self[key] = self.key_func(key)
-        return self[key]
-
-class DisjointSet(typing.Generic[K]):
     def __init__(self, M: int, N: int) -> None:
         self.M, self.N = M, N
-        self.sizes: collections.defaultdict[K, int] = collections.defaultdict(int)
-        self.parents: DefaultKeyDict[K, K] = DefaultKeyDict(lambda pt: pt)
+        self.parents: array.array[int] = array.array('i', range(M * N))
+        self.ranks: bytearray = bytearray(M * N)
 
-    def get_ultimate_parent(self, pt: K) -> K:
-        if self.parents[pt] == pt:
-            return pt
-        else:
-            self.parents[pt] = self.get_ultimate_parent(self.parents[pt])
-            return self.parents[pt]
+    def get_ultimate_parent(self, pt: int) -> int:
+        # Iterative path halving, every node on the way points to its grandparent
+        parents = self.parents
+        while parents[pt] != pt:
+            parents[pt] = parents[parents[pt]]
+            pt = parents[pt]
+        return pt
 
-    def union(self, pt1: K, pt2: K) -> bool:
+    def union(self, pt1: int, pt2: int) -> bool:
         ulp1, ulp2 = self.get_ultimate_parent(pt1), self.get_ultimate_parent(pt2)
         if ulp1 != ulp2:
-            if self.sizes[ulp1] < self.sizes[ulp2]:
+            # Union by rank, attach the shorter tree below the taller one
+            if self.ranks[ulp1] < self.ranks[ulp2]:
                 self.parents[ulp1] = ulp2
-                self.sizes[ulp2] += self.sizes[ulp1]
+            elif self.ranks[ulp1] > self.ranks[ulp2]:
+                self.parents[ulp2] = ulp1
             else:
                 self.parents[ulp2] = ulp1
-                self.sizes[ulp1] += self.sizes[ulp2]
+                self.ranks[ulp1] += 1
         return ulp1 != ulp2
+
+    def union_many(self, pairs: typing.Iterable[tuple[int, int]]) -> list[bool]:
+        """
+        Bulk version of `union`, returns for each pair if it merged two sets.
+        Find and union are inlined to avoid a method call per lookup.
+        """
+        parents, ranks = self.parents, self.ranks
+        merged: list[bool] = []
+        for ulp1, ulp2 in pairs:
+            while parents[ulp1] != ulp1:
+                parents[ulp1] = parents[parents[ulp1]]
+                ulp1 = parents[ulp1]
+            while parents[ulp2] != ulp2:
+                parents[ulp2] = parents[parents[ulp2]]
+                ulp2 = parents[ulp2]
+            if ulp1 == ulp2:
+                merged.append(False)
+                continue
+            if ranks[ulp1] < ranks[ulp2]:
+                parents[ulp1] = ulp2
+            elif ranks[ulp1] > ranks[ulp2]:
+                parents[ulp2] = ulp1
+            else:
+                parents[ulp2] = ulp1
+                ranks[ulp1] += 1
+            merged.append(True)
+        return merged
@@ -1,22 +1,81 @@
 import argparse
+import concurrent.futures
 import curses
 import maze as mz
+import os
+import random
+import typing
 import wcwidth
+from batch import parse_braid, parse_seed, parse_size
+from cache import MazeCache
 
-def main(stdscr: curses.window) -> None:
+# How often (in ms) input is polled and progress redrawn while work runs in the background
+POLL_INTERVAL = 50
 
-    def render(spl_cells: set[tuple[int, int]], color: str) -> None:
+T = typing.TypeVar("T")
+
+class Cancelled(Exception):
+    """
+    Raised inside the work of a cancelled job to unwind it
+    """
+
+class Job(typing.Generic[T]):
+    """
+    Work (generating or solving a maze) running on a background thread behind a future.
+    The work is handed an observer to pass to the maze, which counts the steps taken for
+    the progress and raises `Cancelled` on the next step once the job is cancelled.
+    Work done in bulk checks in with a "progress" event standing for a batch of steps.
+    """
+    def __init__(self, executor: concurrent.futures.Executor, total: int, work: typing.Callable[[mz.Observer], T]) -> None:
+        self.total, self.steps, self.cancelled = max(1, total), 0, False
+        self.future = executor.submit(work, self.observe)
+
+    def observe(self, event: str, idx: int, bit: int) -> None:
+        if self.cancelled:
+            raise Cancelled
+        self.steps += idx if event == "progress" else 1
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        self.future.cancel()
+
+    def progress(self) -> float:
+        # Steps are only an estimate of the work left (loops, walks), so never claim to be done early
+        return min(self.steps / self.total, .99)
+
+def main(stdscr: curses.window, args: argparse.Namespace) -> None:
+
+    def render(spl_cells: set[tuple[int, int]], color: str, dirty: typing.Iterable[tuple[int, int]] | None = None) -> None:
         """
-        Helper to render the board to screen
+        Helper to render the board to screen. Only the dirty cells are repainted,
+        the entire board is repainted only if no dirty cells are passed in.
+        Either way just the part of the board within the viewport is drawn.
         """
-        for i in range(X):
-            x_offset = 0
-            for j in range(Y):
-                char = display_matrix[i][j] if (i, j) not in spl_cells else color
-                main_window.addstr(i, x_offset, char)
-                x_offset += wcwidth.wcswidth(char)
+        if dirty is None:
+            main_window.erase()
+            for i in range(TOP, min(TOP + VIEW_ROWS, X)):
+                main_window.addstr(i - TOP, 0, display_matrix.row(i, LEFT, LEFT + VIEW_COLS))
+            dirty = spl_cells
+        for i, j in dirty:
+            if TOP <= i < TOP + VIEW_ROWS and LEFT <= j < LEFT + VIEW_COLS:
+                char = display_matrix[i, j] if (i, j) not in spl_cells else color
+                main_window.addstr(i - TOP, (j - LEFT) * CELL_WIDTH, char)
         main_window.refresh()
 
+    def follow(position: tuple[int, int]) -> bool:
+        """
+        Moves the viewport to center on position once it gets within a margin of
+        the edges (or off screen), returns whether the viewport moved
+        """
+        nonlocal TOP, LEFT # type: ignore
+        top, left = TOP, LEFT
+        margin_rows, margin_cols = min(SCROLL_MARGIN, VIEW_ROWS // 4), min(SCROLL_MARGIN, VIEW_COLS // 4)
+        if not TOP + margin_rows <= position[0] < TOP + VIEW_ROWS - margin_rows:
+            TOP = max(0, min(position[0] - VIEW_ROWS // 2, X - VIEW_ROWS))
+        if not LEFT + margin_cols <= position[1] < LEFT + VIEW_COLS - margin_cols:
+            LEFT = max(0, min(position[1] - VIEW_COLS // 2, Y - VIEW_COLS))
+        return (TOP, LEFT) != (top, left)
+
     def display_overlay(screen: curses.window, options: list[str], prompt: str) -> str:
         """
         Helper function to display overlays on top of specified window.
@@ -33,36 +92,126 @@ def main(stdscr: curses.window) -> None:
             if ord('1') <= ch <= ord(str(len(options))):
                 return options[ch - ord('1')]
 
-    def start_game():
+    def show_status(message: str) -> None:
+        """
+        Helper to draw a status line below the game info, cleared by an empty message
+        """
+        info_window.move(1, 0)
+        info_window.clrtoeol()
+        if message:
+            info_window.addstr(1, 0, message)
+        info_window.refresh()
+
+    def show_progress(job: Job, message: str) -> None:
         """
-        Initializes a new maze post prompt of maze configurations
+        Helper to draw the progress of a background job below the game info
         """
-        # Show overlay for choosing the generator algorithm
-        generator_options = ["wilson", "kruskal", "prim", "ellers", "backtracking"]
-        allow_multiple_paths_option = ["Yes", "No"]
+        show_status(f"{message} {job.progress():.0%}, 'Q' to cancel." if message else "")
 
-        maze_gen_algorithm = display_overlay(main_window, generator_options, "Choose a maze generator:")
-        multiple_paths = display_overlay(main_window, allow_multiple_paths_option, "Allow multiple paths?")
+    def start_game(previous: mz.Maze | None = None) -> mz.Maze | None:
+        """
+        Initializes a new maze post prompt of maze configurations,
+        or the same maze as the previous game when restarting.
+        The maze is generated in the background, returns None if cancelled.
+        """
+        if previous:
+            maze_gen_algorithm, allow_multiple_paths, seed, braid = previous.algorithm, previous.multiple_paths, previous.seed, previous.braid
+        else:
+            # Show overlay for choosing the generator algorithm
+            generator_options = ["wilson", "kruskal", "prim", "weighted_prim", "ellers", "binary_tree", "sidewinder", "backtracking"]
+            allow_multiple_paths_option = ["Yes", "No"]
 
-        # Initialize the maze based on the selected algorithm and path option
-        maze = mz.Maze(int((ROWS - PADDING_Y) * .48), int((COLS - PADDING_X) * .24), generator_algorithm=maze_gen_algorithm, multiple_paths=(multiple_paths == "Yes"))
+            maze_gen_algorithm = display_overlay(overlay_window, generator_options, "Choose a maze generator:")
+            allow_multiple_paths = display_overlay(overlay_window, allow_multiple_paths_option, "Allow multiple paths?") == "Yes"
+
+            # Every game gets a seed (unless one was passed in) so that it can be replayed
+            seed = args.seed if args.seed is not None else random.getrandbits(63)
+            braid = args.braid
+
+        # Initialize the maze based on the selected algorithm and path option,
+        # it fits the screen unless a size is passed in
+        M, N = args.size or (int((ROWS - PADDING_Y) * .48), int((COLS - PADDING_X) * .24))
+
+        def generate(observer: mz.Observer) -> mz.Maze:
+            if cache:
+                return cache.get(M, N, maze_gen_algorithm, allow_multiple_paths, seed, observer=observer, braid=braid)
+            return mz.Maze(M, N, generator_algorithm=maze_gen_algorithm, multiple_paths=allow_multiple_paths, seed=seed, observer=observer, braid=braid)
+
+        # Every wall broken is a step, a maze has about M x N of them. The input is
+        # polled meanwhile so that generating a large maze can be given up on
+        job: Job[mz.Maze] = Job(executor, M * N, generate)
+        main_window.timeout(POLL_INTERVAL)
+        while not job.future.done():
+            show_progress(job, "Generating maze...")
+            if main_window.getch() == ord("Q"):
+                job.cancel()
+                return None
+        main_window.timeout(-1)
+        show_progress(job, "")
+        maze = job.future.result()
+        maze.observer = None
         return maze
 
-    def toggle_solution(solved: bool):
+    def start_solving() -> Job[mz.Solution]:
         """
-        Solves the maze starting from user's current position.
+        Solves the maze starting from user's current position in the background
         """
-        nonlocal display_matrix # type: ignore
-        if not solved:
-            # Show overlay for choosing the generator algorithm
-            solver_options = ["dijkstra", "a_star", "dead_end_filling"]
-            maze_solver_algorithm = display_overlay(main_window, solver_options, "Choose a maze solver:")
-            maze.solve(maze_solver_algorithm, (CURR[0] // 2, CURR[1] // 2), (maze.M - 1, maze.N - 1))
-        else:
-            maze.unsolve()
+        # Show overlay for choosing the generator algorithm, the maze
+        # underneath is left untouched and simply restored once done
+        solver_options = ["distance_field", "dijkstra", "a_star", "bidirectional_bfs", "bidirectional_a_star", "junction_dijkstra", "junction_a_star", "dead_end_filling", "d_star_lite"]
+        maze_solver_algorithm = display_overlay(overlay_window, solver_options, "Choose a maze solver:")
+        main_window.touchwin()
+        main_window.refresh()
+
+        # Solving only starts once a game is on, the worker holds on to that maze
+        current = maze
+        assert current is not None
+        source = (CURR[0] // 2, CURR[1] // 2)
+        def solve(observer: mz.Observer) -> mz.Solution:
+            current.observer = observer
+            try:
+                return current.find_path(maze_solver_algorithm, source, (current.M - 1, current.N - 1))
+            finally:
+                current.observer = None
 
-        # Refreshing out view
-        display_matrix = maze.board
+        # Every cell expanded is a step, a search expands at most every cell of the maze
+        main_window.timeout(POLL_INTERVAL)
+        return Job(executor, current.M * current.N, solve)
+
+    def stop_solving(job: Job[mz.Solution], cancel: bool = True) -> None:
+        """
+        Helper to go back to waiting on input once a solve is over, cancelling it if still running
+        """
+        if cancel:
+            job.cancel()
+        main_window.timeout(-1)
+        show_progress(job, "")
+
+    def show_solution(solution: mz.Solution) -> set[tuple[int, int]]:
+        """
+        Solvers leave the maze untouched and hand back just the path, which is painted
+        on the board in O(path length). The distance field in particular is cached
+        across hints for as long as the walls don't change, so it needs no search at all.
+        Returns the cells whose solution overlay changed.
+        """
+        nonlocal hint # type: ignore
+        path = solution.coordinates()
+        hint = [(2 * x + 1, 2 * y + 1) for x, y in path]
+        hint += [(x1 + x2 + 1, y1 + y2 + 1) for (x1, y1), (x2, y2) in zip(path, path[1:])]
+        for position in hint:
+            display_matrix[position] = mz.COLORS.visited.value
+        return set(hint)
+
+    def clear_solution() -> set[tuple[int, int]]:
+        """
+        Hint was painted over the board, clear just those cells.
+        Returns the cells whose solution overlay changed.
+        """
+        nonlocal hint # type: ignore
+        for position in hint:
+            del display_matrix[position]
+        dirty, hint = set(hint), []
+        return dirty
 
     # There is no proper typing support in curses for mypy
     # This is added merely for type hint support and never gets executed
@@ -77,58 +226,118 @@ def main(stdscr: curses.window) -> None:
     ROWS, COLS = stdscr.getmaxyx()
     PADDING_X, PADDING_Y = 4, 6
 
+    # The viewport scrolls once the player gets within this many board rows / columns of its edges
+    SCROLL_MARGIN = 4
+
     # Game would contain two windows - game / options and info
     main_window = curses.newwin(ROWS - PADDING_Y, COLS - PADDING_X, PADDING_Y // 2, PADDING_X // 2)
+    overlay_window = curses.newwin(ROWS - PADDING_Y, COLS - PADDING_X, PADDING_Y // 2, PADDING_X // 2)
     info_window = curses.newwin(2, COLS - PADDING_X, ROWS - (PADDING_Y // 2), PADDING_X // 2)
     main_window.keypad(True)
     info_window.keypad(True)
 
-    # Initialize the maze
-    SOLVED = False
-    maze = start_game()
-
-    # Display game info / hints
-    info_window.addstr(0, 0, "Use Arrow Keys to navigate, 'H' for Help, 'Q' to Quit.")
-    info_window.refresh()
-
-    # Some maze related data variables for rendering maze
-    display_matrix: list[list[str]] = maze.board
-    X, Y = len(display_matrix), len(display_matrix[0])
-    CURR, DEST = (1, 1), (X - 2, Y - 2)
-    render({CURR, DEST}, mz.COLORS.current.value)
-
-    while CURR != DEST:
-        ch = main_window.getch()
-
-        if ch == curses.KEY_DOWN or ch == ord('j'):
-            NEXT = (CURR[0] + 1, CURR[1])
-        elif ch == curses.KEY_UP or ch == ord('k'):
-            NEXT = (CURR[0] - 1, CURR[1])
-        elif ch == curses.KEY_LEFT or ch == ord('h'):
-            NEXT = (CURR[0], CURR[1] - 1)
-        elif ch == curses.KEY_RIGHT or ch == ord('l'):
-            NEXT = (CURR[0], CURR[1] + 1)
-        elif ch == ord("H"):
-            toggle_solution(SOLVED)
-            SOLVED = not SOLVED
-            NEXT = CURR
-        elif ch == ord("Q"):
+    # Generated mazes are cached on disk (unless disabled), keyed by everything that determines them
+    cache = MazeCache(args.cache_dir, args.cache_size * 2 ** 20) if args.cache_dir else None
+
+    # Generating and solving run on a single background thread, so the game keeps
+    # responding meanwhile and a job is always done (or given up on) before the next one
+    executor = concurrent.futures.ThreadPoolExecutor(1)
+    maze: mz.Maze | None = None
+    hint: list[tuple[int, int]] = []
+    while True:
+        # Initialize the maze, hint holds the board cells painted by the last solution.
+        # Restarting plays the same maze again, straight out of the cache
+        SOLVED = False
+        hint = []
+        solving: Job[mz.Solution] | None = None
+        maze = start_game(maze)
+        if maze is None:
             break
-        else:
-            continue
 
-        if display_matrix[NEXT[0]][NEXT[1]] != mz.COLORS.wall.value:
-            CURR = NEXT
-            render({CURR, DEST}, mz.COLORS.current.value)
+        # Display game info / hints
+        info_window.addstr(0, 0, "Use Arrow Keys to navigate, 'H' for Help, 'Q' to Quit.")
+        info_window.refresh()
+
+        # Some maze related data variables for rendering maze. The board is a lazy view
+        # worked out from the walls of the cells drawn, so it is never built in whole
+        display_matrix = mz.BoardView(maze)
+        X, Y = display_matrix.rows, display_matrix.cols
+        CURR, DEST = (1, 1), (X - 2, Y - 2)
+
+        # Every glyph is drawn in a fixed width column, the viewport holds as many
+        # rows and columns of the board as fit in the window and follows the player
+        CELL_WIDTH = max(wcwidth.wcswidth(color.value) for color in mz.COLORS)
+        VIEW_ROWS, VIEW_COLS = ROWS - PADDING_Y, (COLS - PADDING_X - 1) // CELL_WIDTH
+        TOP, LEFT = 0, 0
+        follow(CURR)
+        render({CURR, DEST}, mz.COLORS.current.value)
+
+        while CURR != DEST:
+            if solving and solving.future.done():
+                stop_solving(solving, cancel=False)
+                if not solving.cancelled:
+                    solution = solving.future.result()
+                    if solution.length is None:
+                        show_status("No path from here to the exit.")
+                    else:
+                        SOLVED = True
+                        render({CURR, DEST}, mz.COLORS.current.value, show_solution(solution))
+                solving = None
+            elif solving:
+                show_progress(solving, "Solving...")
+            ch = main_window.getch()
+
+            if ch == curses.KEY_DOWN or ch == ord('j'):
+                NEXT = (CURR[0] + 1, CURR[1])
+            elif ch == curses.KEY_UP or ch == ord('k'):
+                NEXT = (CURR[0] - 1, CURR[1])
+            elif ch == curses.KEY_LEFT or ch == ord('h'):
+                NEXT = (CURR[0], CURR[1] - 1)
+            elif ch == curses.KEY_RIGHT or ch == ord('l'):
+                NEXT = (CURR[0], CURR[1] + 1)
+            elif ch == ord("H"):
+                # H while solving gives up on it, otherwise it toggles the hint
+                if solving:
+                    stop_solving(solving)
+                    solving = None
+                elif SOLVED:
+                    SOLVED = False
+                    render({CURR, DEST}, mz.COLORS.current.value, clear_solution())
+                else:
+                    solving = start_solving()
+                continue
+            elif ch == curses.KEY_RESIZE:
+                render({CURR, DEST}, mz.COLORS.current.value)
+                continue
+            elif ch == ord("Q"):
+                break
+            else:
+                continue
+
+            if display_matrix[NEXT] != mz.COLORS.wall.value:
+                PREV, CURR = CURR, NEXT
+                render({CURR, DEST}, mz.COLORS.current.value, None if follow(CURR) else (PREV, CURR))
+
+        # Clear all display just the maze and prepare to quit
+        if solving:
+            stop_solving(solving)
+        dirty = clear_solution() if SOLVED else set()
+        render({DEST}, mz.COLORS.empty.value, dirty | {CURR, DEST})
+        info_window.clear()
+        info_window.addstr(0, 0, "Press 'R' to restart this maze, any other key to close.")
+        info_window.refresh()
+        if main_window.getch() != ord("R"):
+            break
+        info_window.clear()
 
-    # Clear all display just the maze and prepare to quit
-    maze.unsolve()
-    display_matrix = maze.board
-    render({DEST}, mz.COLORS.empty.value)
-    info_window.clear()
-    info_window.addstr(0, 0, "Press any key to close.")
-    info_window.refresh()
-    ch = main_window.getch()
+    # Anything still running is on its way out, it stops at its next step
+    executor.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
-    curses.wrapper(main)
+    parser = argparse.ArgumentParser(description="Maze game in the terminal.")
+    parser.add_argument("--seed", type=parse_seed, help="generate the maze from this seed, the same seed and options give the same maze")
+    parser.add_argument("--size", type=parse_size, help="maze size as MxN, larger mazes than the screen scroll along with the player")
+    parser.add_argument("--braid", type=parse_braid, default=mz.Braid(), help="how multiple paths are added, density=WALLS_PER_CELL or dead_ends=FRACTION (default: density=0.1)")
+    parser.add_argument("--cache-dir", default=os.path.join(os.path.expanduser("~"), ".cache", "maze"), help="directory to cache generated mazes in, an empty string disables the cache")
+    parser.add_argument("--cache-size", type=int, default=64, help="evict least recently used mazes beyond this many MB")
+    curses.wrapper(main, parser.parse_args())
@@ -0,0 +1,168 @@
+# Batch production of mazes across a process pool, e.g. for datasets.
+# Results are streamed to a single file as they come in, so memory stays
+# flat no matter how many mazes are asked for.
+
+import argparse
+import array
+import collections
+import concurrent.futures
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import typing
+
+import maze as mz
+
+class Spec(typing.NamedTuple):
+    """
+    Everything that determines a maze, the same spec always gives the same maze
+    """
+    algorithm: str
+    M: int
+    N: int
+    multiple_paths: bool
+    seed: int
+    braid: mz.Braid = mz.Braid()
+
+# Every record in a batch file is a maze in the packed binary format (see `Maze.save`)
+# followed by its solution from the top left to the bottom right cell: the number of
+# cells on the path (0 if not solved) and, for a solved maze, the direction of every
+# step as a 2 bit code, four to a byte
+_SOLUTION_HEADER = struct.Struct("<I")
+_DIRECTIONS = (mz.UP, mz.DOWN, mz.LEFT, mz.RIGHT)
+
+def encode_path(path: typing.Sequence[int], N: int) -> bytes:
+    """
+    Path of flat cell indices as a length followed by the packed direction of each step
+    """
+    if not path:
+        return _SOLUTION_HEADER.pack(0)
+    code = {-N: 0, N: 1, -1: 2, 1: 3}
+    steps = bytes(code[nxt - curr] for curr, nxt in zip(path, path[1:]))
+    return _SOLUTION_HEADER.pack(len(path)) + mz.pack_codes(steps)
+
+def decode_path(buffer: mmap.mmap | bytes, offset: int, maze: mz.Maze) -> tuple[array.array, int]:
+    """
+    Path written by `encode_path` at offset, along with the offset right after it
+    """
+    (length,) = _SOLUTION_HEADER.unpack_from(buffer, offset)
+    offset += _SOLUTION_HEADER.size
+    path: array.array[int] = array.array('i')
+    if not length:
+        return path, offset
+    end = offset + (length + 2) // 4
+    step = maze.steps()
+    curr = 0
+    path.append(curr)
+    for code in mz.unpack_codes(bytes(buffer[offset: end]), length - 1):
+        curr += step[_DIRECTIONS[code]]
+        path.append(curr)
+    return path, end
+
+def produce(spec: Spec, solver: str | None = None) -> bytes:
+    """
+    Worker generating (and optionally solving) a single maze, handed back as a
+    record ready to be written. Records are compact, which keeps the traffic
+    between the processes low as well.
+    """
+    maze = mz.Maze(spec.M, spec.N, spec.algorithm, spec.multiple_paths, seed=spec.seed, braid=spec.braid)
+    path: typing.Sequence[int] = []
+    if solver:
+        path = maze.find_path(solver, (0, 0), (spec.M - 1, spec.N - 1)).path
+    return maze.to_bytes() + encode_path(path, spec.N)
+
+def run_batch(specs: typing.Iterable[Spec], output: typing.BinaryIO, solver: str | None = None, workers: int | None = None, in_flight: int | None = None) -> int:
+    """
+    Step 1: Lazily pull specs and hand them to a pool of worker processes, with at most
+    `in_flight` of them submitted but not yet written at any point in time.
+
+    Step 2: Write the records out in the order of the specs as soon as they are done,
+    waiting on the oldest one whenever the window is full.
+
+    Only the specs and records within the window are ever held in memory.
+    Returns the number of mazes written.
+    """
+    written = 0
+    workers = workers or os.cpu_count() or 1
+    in_flight = in_flight or 2 * workers
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending: collections.deque[concurrent.futures.Future[bytes]] = collections.deque()
+        for spec in specs:
+            if len(pending) >= in_flight:
+                output.write(pending.popleft().result())
+                written += 1
+            pending.append(executor.submit(produce, spec, solver))
+        while pending:
+            output.write(pending.popleft().result())
+            written += 1
+    output.flush()
+    return written
+
+def read_batch(path: str) -> typing.Iterator[tuple[mz.Maze, array.array]]:
+    """
+    Mazes of a batch file along with their solutions (empty if not solved). The file is
+    memory mapped and each maze reads its walls straight off it until needed in whole.
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    offset = 0
+    while offset < len(buffer):
+        maze = mz.Maze.from_buffer(buffer, offset, name=path)
+        solution, offset = decode_path(buffer, typing.cast(mz.PackedWalls, maze.packed_walls).end, maze)
+        yield maze, solution
+
+def parse_size(size: str) -> tuple[int, int]:
+    M, _, N = size.partition("x")
+    return int(M), int(N or M)
+
+def parse_seed(seed: str) -> int:
+    value = int(seed)
+    if value not in mz.SEEDS:
+        raise argparse.ArgumentTypeError(f"seed {value} doesn't fit in a signed 64 bit int")
+    return value
+
+def parse_braid(braid: str) -> mz.Braid:
+    mode, _, amount = braid.partition("=")
+    return mz.Braid(mode, float(amount)) if amount else mz.Braid(mode)
+
+def load_specs(path: str) -> typing.Iterator[Spec]:
+    """
+    Specs from a JSON lines file, one object per line with algorithm, M, N, multiple_paths, braid and seed
+    """
+    with open(sys.stdin.fileno() if path == "-" else path, closefd=path != "-") as file:
+        for line in file:
+            if line.strip():
+                spec = json.loads(line)
+                yield Spec(spec["algorithm"], spec["M"], spec["N"], spec.get("multiple_paths", True), spec["seed"], parse_braid(spec.get("braid", "density")))
+
+# +++++++++++++++++ MAIN FUNCTION +++++++++++++++++ #
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate (and solve) mazes in bulk across a process pool.")
+    parser.add_argument("output", help="batch file to write the mazes to")
+    parser.add_argument("--specs", help="JSON lines file of specs ('-' for stdin), instead of the options below")
+    parser.add_argument("--count", type=int, default=1000, help="number of mazes, seeded seed, seed + 1, ...")
+    parser.add_argument("--algorithms", nargs="+", default=["wilson"], help="generators to cycle through")
+    parser.add_argument("--size", type=parse_size, default=(32, 32), help="maze size as MxN")
+    parser.add_argument("--perfect", action="store_true", help="don't add multiple paths")
+    parser.add_argument("--braid", type=parse_braid, default=mz.Braid(), help="how to add multiple paths, density=WALLS_PER_CELL or dead_ends=FRACTION (default: density=0.1)")
+    parser.add_argument("--seed", type=parse_seed, default=0, help="seed of the first maze")
+    parser.add_argument("--solver", help="also solve every maze with this solver (e.g. bfs, a_star)")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--in-flight", type=int, help="most mazes being worked on at once (default: twice the workers)")
+    args = parser.parse_args()
+
+    if args.specs:
+        specs: typing.Iterable[Spec] = load_specs(args.specs)
+    else:
+        M, N = args.size
+        specs = (Spec(args.algorithms[i % len(args.algorithms)], M, N, not args.perfect, args.seed + i, args.braid) for i in range(args.count))
+
+    start = time.perf_counter()
+    with open(args.output, "wb") as output:
+        count = run_batch(specs, output, args.solver, args.workers, args.in_flight)
+    elapsed = time.perf_counter() - start
+    print(f"{count} mazes in {elapsed:.2f}s ({count / elapsed:.1f} mazes/s), {os.path.getsize(args.output)} bytes", file=sys.stderr)
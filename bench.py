@@ -0,0 +1,213 @@
+# Benchmark runner for the maze generators, solvers, rendering and DSU
+# Results are written as JSON so that two runs can be diffed with --compare
+
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import typing
+
+import DSU
+import maze as mz
+
+GENERATORS = ["wilson", "kruskal", "prim", "weighted_prim", "ellers", "binary_tree", "sidewinder", "backtracking"]
+SOLVERS = ["bfs", "dijkstra", "a_star", "bidirectional_bfs", "bidirectional_a_star", "junction_dijkstra", "junction_a_star", "dead_end_filling", "distance_field", "d_star_lite"]
+RENDERERS = ["board", "render"]
+
+# Maze sizes in cells, 10^2 upto 10^7, every maze is (roughly) square
+SIZES = [10 ** k for k in range(2, 8)]
+
+# A benchmark is a function run right after seeding the RNG, it returns the
+# counters of the maze it ran on (see `maze.Stats`), empty where that doesn't apply
+Benchmark = typing.Callable[[], dict[str, int]]
+
+def dimensions(cells: int) -> tuple[int, int]:
+    """
+    Splits a number of cells into the sides of a (roughly) square maze
+    """
+    M = max(1, math.isqrt(cells))
+    return M, max(1, round(cells / M))
+
+def measure(benchmark: Benchmark, seed: int, memory: bool, repeat: int = 1) -> dict[str, typing.Any]:
+    """
+    Step 1: Seed the RNG and time a run of the benchmark, keeping the best of
+    `repeat` runs to filter out noise from the rest of the machine.
+
+    Step 2: If asked for, seed the RNG again and repeat the exact same run under
+    tracemalloc to get the peak memory. It runs separately since tracing
+    allocations slows down everything considerably and would skew the timings.
+    """
+    seconds = math.inf
+    for _ in range(repeat):
+        random.seed(seed)
+        start = time.perf_counter()
+        counters = benchmark()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        random.seed(seed)
+        tracemalloc.start()
+        try:
+            benchmark()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": seconds, "nodes_expanded": counters.get("nodes_expanded", 0), "peak_bytes": peak, "counters": counters}
+
+def generator_benchmark(algorithm: str, M: int, N: int, observer: mz.Observer | None = None) -> Benchmark:
+    def run() -> dict[str, int]:
+        return mz.Maze(M, N, algorithm, multiple_paths=False, observer=observer).stats.counters
+    return run
+
+def solver_benchmark(maze: mz.Maze, algorithm: str, observer: mz.Observer | None = None) -> Benchmark:
+    def run() -> dict[str, int]:
+        # Bumping the revision drops every cache compiled from the walls
+        # (open directions, distance fields, junction graph), so each run is a cold one
+        maze.revision += 1
+        maze.observer = observer
+        maze.find_path(algorithm, (0, 0), (maze.M - 1, maze.N - 1))
+        maze.observer = None
+        return maze.stats.counters
+    return run
+
+def render_benchmark(maze: mz.Maze, algorithm: str) -> Benchmark:
+    def run() -> dict[str, int]:
+        if algorithm == "board":
+            maze.board
+        else:
+            maze.render()
+        return {}
+    return run
+
+def dsu_benchmark(M: int, N: int, edges: list[tuple[int, int]]) -> Benchmark:
+    def run() -> dict[str, int]:
+        dsu = DSU.DisjointSet(M, N)
+        dsu.union_many(edges)
+        return {}
+    return run
+
+def null_observer(event: str, idx: int, bit: int) -> None:
+    """
+    Observer that does nothing, to measure the cost of the hooks themselves
+    """
+
+def grid_edges(M: int, N: int) -> list[tuple[int, int]]:
+    """
+    All pairs of adjacent cells in a M x N grid in random order, i.e. Kruskal's workload
+    """
+    edges = [(idx, idx + 1) for idx in range(M * N) if (idx + 1) % N]
+    edges += [(idx, idx + N) for idx in range((M - 1) * N)]
+    random.shuffle(edges)
+    return edges
+
+def run(sizes: list[int], seed: int, memory: bool, budget: float, only: set[str] | None = None, observer: mz.Observer | None = None, repeat: int = 1, log: typing.TextIO = sys.stderr) -> dict[str, typing.Any]:
+    """
+    Sweeps every benchmark across all the sizes, smallest first. A benchmark that
+    took longer than `budget` seconds at some size is skipped for all the larger ones,
+    so the slow algorithms don't hold up the sweep at the top end.
+    The observer, if any, is attached to every generator and solver.
+    """
+    results: list[dict[str, typing.Any]] = []
+    exhausted: set[tuple[str, str]] = set()
+
+    def record(kind: str, algorithm: str, M: int, N: int, benchmark: Benchmark) -> dict[str, typing.Any] | None:
+        if (kind, algorithm) in exhausted or (only and kind not in only):
+            return None
+        result: dict[str, typing.Any] = {"kind": kind, "algorithm": algorithm, "M": M, "N": N, "cells": M * N, "seed": seed}
+        result.update(measure(benchmark, seed, memory, repeat))
+        result["cells_per_second"] = M * N / result["seconds"] if result["seconds"] else None
+        if result["seconds"] > budget:
+            exhausted.add((kind, algorithm))
+        results.append(result)
+        print(f"{kind:>9} {algorithm:<21} {M:>5} x {N:<5} {result['seconds']:>9.4f}s {result['nodes_expanded']:>9}", file=log)
+        return result
+
+    for cells in sizes:
+        M, N = dimensions(cells)
+        for algorithm in GENERATORS:
+            record("generate", algorithm, M, N, generator_benchmark(algorithm, M, N, observer))
+
+        # Solvers and renderers share one maze with loops per size
+        random.seed(seed)
+        maze = mz.Maze(M, N, "kruskal", multiple_paths=True)
+        for algorithm in SOLVERS:
+            result = record("solve", algorithm, M, N, solver_benchmark(maze, algorithm, observer))
+            if result:
+                result["path_length"] = result["counters"].get("path_length")
+        for algorithm in RENDERERS:
+            record("render", algorithm, M, N, render_benchmark(maze, algorithm))
+        del maze
+
+        random.seed(seed)
+        record("dsu", "union_many", M, N, dsu_benchmark(M, N, grid_edges(M, N)))
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "seed": seed,
+            "memory": memory,
+            "observer": observer is not None,
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def compare(baseline: dict[str, typing.Any], current: dict[str, typing.Any], threshold: float = 0.1) -> list[str]:
+    """
+    Diffs two benchmark runs, matching results on (kind, algorithm, M, N).
+    Reports the time ratio of every pair, flagging those beyond the threshold,
+    and any change in the number of expanded nodes or path length with the same seed.
+    """
+    def key(result: dict[str, typing.Any]) -> tuple[str, str, int, int]:
+        return result["kind"], result["algorithm"], result["M"], result["N"]
+
+    before = {key(result): result for result in baseline["results"]}
+    lines: list[str] = []
+    for result in current["results"]:
+        old = before.get(key(result))
+        if not old:
+            continue
+        ratio = result["seconds"] / old["seconds"] if old["seconds"] else math.inf
+        flag = "slower" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else ""
+        line = f"{result['kind']:>9} {result['algorithm']:<21} {result['M']:>5} x {result['N']:<5} {ratio:>7.2f}x {flag}"
+        for field in ("nodes_expanded", "path_length", "peak_bytes"):
+            if old.get(field) is not None and result.get(field) is not None and old[field] != result[field]:
+                line += f" {field} {old[field]} -> {result[field]}"
+        lines.append(line.rstrip())
+    return lines
+
+# +++++++++++++++++ MAIN FUNCTION +++++++++++++++++ #
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the maze generators, solvers, rendering and DSU.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES[:4], help="maze sizes in cells (default: 10^2 upto 10^5, the full sweep goes upto 10^7)")
+    parser.add_argument("--full", action="store_true", help="sweep all sizes from 10^2 upto 10^7 cells")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=30.0, help="skip larger sizes of a benchmark once it took longer than this many seconds")
+    parser.add_argument("--only", nargs="+", choices=["generate", "solve", "render", "dsu"], help="run only these kinds of benchmarks")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs measuring peak memory")
+    parser.add_argument("--repeat", type=int, default=1, help="time the best of this many runs of every benchmark")
+    parser.add_argument("--observer", action="store_true", help="attach an observer that does nothing, compare against a run without to get the cost of the hooks")
+    parser.add_argument("--output", "-o", help="write results as JSON to this file (default: stdout)")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    report = run(SIZES if args.full else args.sizes, args.seed, not args.no_memory, args.budget, set(args.only) if args.only else None, null_observer if args.observer else None, args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            print("\n".join(compare(json.load(file), report)), file=sys.stderr)
@@ -0,0 +1,122 @@
+# On disk cache of generated mazes, content addressed by everything
+# that determines a maze: algorithm, size, multiple paths, braid and seed
+
+import hashlib
+import os
+import tempfile
+
+import maze as mz
+
+class MazeCache:
+    """
+    Directory of saved mazes (see `Maze.save`), each named after a hash of its key.
+    Once the files add up to more than `max_bytes` the least recently used ones are
+    evicted. Uses are tracked through the file modification times, so the cache
+    outlives the process and can be shared by several processes at once.
+    """
+    SUFFIX = ".maze"
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 2 ** 20) -> None:
+        self.directory, self.max_bytes = directory, max_bytes
+        self.hits = self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(algorithm: str, M: int, N: int, multiple_paths: bool, seed: int, braid: mz.Braid = mz.Braid()) -> str:
+        return hashlib.sha256(f"{algorithm}:{M}:{N}:{int(multiple_paths)}:{braid}:{seed}".encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + MazeCache.SUFFIX)
+
+    def get(self, M: int, N: int, algorithm: str = "wilson", multiple_paths: bool = True, seed: int | None = None, observer: mz.Observer | None = None, braid: mz.Braid = mz.Braid()) -> mz.Maze:
+        """
+        Same maze as `Maze(M, N, algorithm, multiple_paths, seed=seed, braid=braid)`, loaded from
+        the cache if it's there and generated (and cached) otherwise.
+        Mazes without a seed can't be asked for again, so they are not cached.
+        The observer is attached to the maze, it only sees generation on a miss.
+        """
+        if seed is None:
+            return mz.Maze(M, N, algorithm, multiple_paths, observer=observer, braid=braid)
+
+        path = self.path(MazeCache.key(algorithm, M, N, multiple_paths, seed, braid))
+        try:
+            maze = mz.Maze.load(path, observer)
+        except (FileNotFoundError, ValueError):
+            pass
+        else:
+            # Guard against a corrupt file (or a hash collision) handing back another maze
+            if (maze.algorithm, maze.M, maze.N, maze.multiple_paths, maze.braid, maze.seed) == (algorithm, M, N, multiple_paths, braid, seed):
+                self.touch(path)
+                self.hits += 1
+                return maze
+
+        self.misses += 1
+        maze = mz.Maze(M, N, algorithm, multiple_paths, seed=seed, observer=observer, braid=braid)
+        self.put(maze)
+        return maze
+
+    def put(self, maze: mz.Maze) -> None:
+        """
+        Saves a maze into the cache. It is written to a temporary file first and moved
+        into place, so other processes never see a half written maze.
+        """
+        if maze.seed is None:
+            return
+        path = self.path(MazeCache.key(maze.algorithm, maze.M, maze.N, maze.multiple_paths, maze.seed, maze.braid))
+        descriptor, temporary = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        os.close(descriptor)
+        try:
+            maze.save(temporary)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.evict(keep=path)
+
+    def touch(self, path: str) -> None:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep: str | None = None) -> None:
+        """
+        Step 1: Collect the size and last use of every cached maze.
+
+        Step 2: If they add up to more than max_bytes, remove the least recently
+        used ones until they fit. The maze just put in (`keep`) always stays.
+        """
+        entries: list[tuple[float, int, str]] = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(MazeCache.SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def size(self) -> int:
+        """
+        Total bytes of all the mazes in the cache
+        """
+        with os.scandir(self.directory) as it:
+            return sum(entry.stat().st_size for entry in it if entry.name.endswith(MazeCache.SUFFIX))
+
+    def clear(self) -> None:
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(MazeCache.SUFFIX):
+                    os.remove(entry.path)
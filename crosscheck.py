@@ -0,0 +1,295 @@
+# Randomized cross checks of the solvers that keep state across queries (D* Lite,
+# the tree index, the junction graph) against a plain BFS over the same walls, and
+# round trips of mazes through the saved file format, the maze cache and batch files.
+# Every run is seeded, a failure names the seed and query to replay it with.
+
+import argparse
+import collections
+import os
+import random
+import sys
+import tempfile
+import time
+import typing
+
+import batch
+import cache
+import maze as mz
+
+GENERATORS = ["wilson", "kruskal", "prim", "weighted_prim", "ellers", "binary_tree", "sidewinder", "backtracking"]
+
+def bfs_distances(maze: mz.Maze, source: int) -> dict[int, int]:
+    """
+    Distance of every cell reachable from source, read straight off the cell walls
+    """
+    cells, step = maze.cells, maze.steps()
+    distances = {source: 0}
+    to_visit: collections.deque[int] = collections.deque([source])
+    while to_visit:
+        curr = to_visit.popleft()
+        for bit in mz.WALL_BITS[~cells[curr] & mz.ALL_WALLS]:
+            nxt = curr + step[bit]
+            if nxt not in distances:
+                distances[nxt] = distances[curr] + 1
+                to_visit.append(nxt)
+    return distances
+
+def check_path(maze: mz.Maze, path: typing.Sequence[int], source: int, destination: int, context: str) -> None:
+    """
+    Path runs from source to destination through open walls only and is as short as BFS says
+    """
+    expected = bfs_distances(maze, source).get(destination)
+    if expected is None:
+        assert not path, f"{context}: path {list(path)[:5]}... to an unreachable destination"
+        return
+    assert path and path[0] == source and path[-1] == destination, f"{context}: path doesn't run from {source} to {destination}"
+    opened = {1: mz.RIGHT, -1: mz.LEFT, maze.N: mz.DOWN, -maze.N: mz.UP}
+    for curr, nxt in zip(path, path[1:]):
+        assert nxt - curr in opened and not maze.cells[curr] & opened[nxt - curr], f"{context}: step {curr} -> {nxt} goes through a wall"
+    assert len(path) - 1 == expected, f"{context}: path of length {len(path) - 1}, BFS says {expected}"
+
+def random_maze(rng: random.Random, size: int, multiple_paths: bool) -> mz.Maze:
+    return mz.Maze(rng.randint(1, size), rng.randint(1, size), rng.choice(GENERATORS), multiple_paths, seed=rng.getrandbits(63))
+
+def random_wall(rng: random.Random, maze: mz.Maze) -> tuple[int, int, int, int] | None:
+    """
+    Random pair of neighbouring cells (x, y, nx, ny), None in a 1 x 1 maze
+    """
+    x, y = rng.randrange(maze.M), rng.randrange(maze.N)
+    neighbours = maze.get_neighbours(x, y)
+    return (x, y, *rng.choice(neighbours)) if neighbours else None
+
+def check_d_star_lite(rng: random.Random, trials: int, size: int) -> int:
+    """
+    Queries a replanner while the source moves, walls break and get built one at a time
+    (repaired piecemeal), walls change in batch (start over) and the destination moves
+    (a new planner). Returns the number of queries checked.
+    """
+    queries = 0
+    for trial in range(trials):
+        maze = random_maze(rng, size, rng.random() < .6)
+        dest = (rng.randrange(maze.M), rng.randrange(maze.N))
+        for query in range(30):
+            action = rng.random()
+            wall = random_wall(rng, maze)
+            if action < .4 and wall:
+                (maze.break_wall if rng.random() < .5 else maze.build_wall)(*wall)
+            elif action < .45:
+                maze.add_multiple_paths(3)
+            elif action < .5:
+                dest = (rng.randrange(maze.M), rng.randrange(maze.N))
+            source = (rng.randrange(maze.M), rng.randrange(maze.N))
+            solution = maze.find_path("d_star_lite", source, dest)
+            check_path(maze, solution.path, maze.index(*source), maze.index(*dest), f"d_star_lite trial {trial} query {query}")
+            queries += 1
+    return queries
+
+def check_tree_index(rng: random.Random, trials: int, size: int) -> int:
+    """
+    Checks the lowest common ancestor against walking the parents up by hand, and paths,
+    distances and next steps (one at a time and in batch) against BFS on perfect mazes
+    """
+    queries = 0
+    for trial in range(trials):
+        maze = random_maze(rng, size, False)
+        index, cells = maze.tree_index(), maze.M * maze.N
+        sources = [rng.randrange(cells) for _ in range(20)]
+        destinations = [rng.randrange(cells) for _ in range(20)]
+        distances, next_steps = index.distances(sources, destinations), index.next_steps(sources, destinations)
+        for query, (u, v) in enumerate(zip(sources, destinations)):
+            context = f"tree_index trial {trial} query {query}"
+            ancestors, curr = {u}, u
+            while index.parent[curr] != curr:
+                curr = index.parent[curr]
+                ancestors.add(curr)
+            lca = v
+            while lca not in ancestors:
+                lca = index.parent[lca]
+            assert index.lca(u, v) == lca, f"{context}: lca {index.lca(u, v)}, walking up gives {lca}"
+            path = index.path(u, v)
+            check_path(maze, path, u, v, context)
+            assert distances[query] == index.distance(u, v) == len(path) - 1, f"{context}: distances disagree with the path"
+            assert next_steps[query] == index.next_step(u, v) == (path[1] if len(path) > 1 else u), f"{context}: next steps disagree with the path"
+            queries += 1
+    return queries
+
+def check_junction_graph(rng: random.Random, trials: int, size: int) -> int:
+    """
+    Queries the junction graph with and without the heuristic on mazes with loops,
+    breaking a few more walls in between so the graph is rebuilt
+    """
+    queries = 0
+    for trial in range(trials):
+        maze = random_maze(rng, size, rng.random() < .8)
+        for rebuild in range(3):
+            for _ in range(rng.randint(0, maze.M * maze.N // 4)):
+                wall = random_wall(rng, maze)
+                if wall:
+                    maze.break_wall(*wall)
+            for query in range(4):
+                source, dest = (rng.randrange(maze.M), rng.randrange(maze.N)), (rng.randrange(maze.M), rng.randrange(maze.N))
+                for algorithm in ("junction_dijkstra", "junction_a_star"):
+                    solution = maze.find_path(algorithm, source, dest)
+                    check_path(maze, solution.path, maze.index(*source), maze.index(*dest), f"{algorithm} trial {trial} rebuild {rebuild} query {query}")
+                    queries += 1
+    return queries
+
+# Seeds at the edges of what a file holds, -1 being what older files wrote for no seed
+EDGE_SEEDS = [-1, 0, 1, -2 ** 63, 2 ** 63 - 1]
+
+def legacy_bytes(maze: mz.Maze, version: int) -> bytes:
+    """
+    The maze as an older format version wrote it: -1 for no seed and, before version 2, no braid amount
+    """
+    name = maze.algorithm.encode()
+    packed = maze.to_bytes()[mz._FILE_HEADER.size + len(name):]
+    flags = (mz._MULTIPLE_PATHS_FLAG if maze.multiple_paths else 0) | (mz._DEAD_ENDS_FLAG if version > 1 and maze.braid.mode == "dead_ends" else 0)
+    amount = [maze.braid.amount] if version > 1 else []
+    header = mz._FILE_HEADERS[version].pack(mz._FILE_MAGIC, version, flags, len(name), maze.M, maze.N, -1 if maze.seed is None else maze.seed, *amount)
+    return header + name + packed
+
+def check_file_format(rng: random.Random, trials: int, size: int) -> int:
+    """
+    Saves random mazes with random and edge case seeds in the current and every older
+    format version, loads them back (after some padding, as in a batch file) and compares
+    the header fields, the walls looked up lazily, the walls read in whole and the bytes
+    written back out
+    """
+    queries = 0
+    for trial in range(trials):
+        braid = mz.Braid(rng.choice(["density", "dead_ends"]), rng.choice([0.0, 0.1, 0.5, 1.0]))
+        maze = mz.Maze(rng.randint(1, size), rng.randint(1, size), rng.choice(GENERATORS), rng.random() < .6, seed=rng.getrandbits(63), braid=braid)
+        maze.seed = rng.choice([None, *EDGE_SEEDS, rng.randrange(-2 ** 63, 2 ** 63)])
+        adjacency = maze.adjacency()
+        for version in mz._FILE_HEADERS:
+            context = f"file_format trial {trial} version {version} seed {maze.seed}"
+            data = maze.to_bytes() if version == mz._FILE_VERSION else legacy_bytes(maze, version)
+            padding = rng.randrange(8)
+            loaded = mz.Maze.from_buffer(bytes(padding) + data, padding)
+            expected = (maze.algorithm, maze.M, maze.N, maze.multiple_paths, maze.braid if version > 1 else mz.Braid(), None if version < 3 and maze.seed == -1 else maze.seed)
+            assert (loaded.algorithm, loaded.M, loaded.N, loaded.multiple_paths, loaded.braid, loaded.seed) == expected, f"{context}: header loads back as {loaded.algorithm, loaded.M, loaded.N, loaded.multiple_paths, loaded.braid, loaded.seed}"
+            packed = typing.cast(mz.PackedWalls, loaded.packed_walls)
+            assert packed.end == padding + len(data), f"{context}: walls end at {packed.end}, the record at {padding + len(data)}"
+            assert bytes(packed) == adjacency, f"{context}: walls looked up off the file differ"
+            if version == mz._FILE_VERSION:
+                assert loaded.to_bytes() == data, f"{context}: saving the maze before reading its walls changes the bytes"
+            loaded.load_cells()
+            assert loaded.cells == maze.cells, f"{context}: walls read in whole differ"
+            queries += 1
+    return queries
+
+def cached_files(directory: str) -> dict[str, float]:
+    with os.scandir(directory) as it:
+        return {entry.path: entry.stat().st_mtime for entry in it if entry.name.endswith(cache.MazeCache.SUFFIX)}
+
+def check_cache(rng: random.Random, trials: int, size: int) -> int:
+    """
+    Asks a small cache for mazes out of a handful of keys (seed -1 among them) and checks
+    that a get hits exactly when the maze is on disk, hands back the same maze as generating
+    it does and evicts only mazes used less recently than every one it keeps
+    """
+    queries = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for trial in range(trials):
+            mazes = cache.MazeCache(directory, rng.randint(0, 400))
+            mazes.clear()
+            keys = [(rng.randint(1, size), rng.randint(1, size), rng.choice(GENERATORS), rng.random() < .6, rng.choice([*EDGE_SEEDS, rng.getrandbits(63)]), mz.Braid(rng.choice(["density", "dead_ends"])))
+                    for _ in range(rng.randint(1, 6))]
+            for query in range(10):
+                M, N, algorithm, multiple_paths, seed, braid = key = rng.choice(keys)
+                context = f"cache trial {trial} query {query} key {key}"
+                path, before, hits, misses = mazes.path(mazes.key(algorithm, M, N, multiple_paths, seed, braid)), cached_files(directory), mazes.hits, mazes.misses
+                maze = mazes.get(M, N, algorithm, multiple_paths, seed, braid=braid)
+                assert (mazes.hits - hits, mazes.misses - misses) == ((1, 0) if path in before else (0, 1)), f"{context}: {'missed' if path in before else 'hit'} the cache"
+                fresh = mz.Maze(M, N, algorithm, multiple_paths, seed=seed, braid=braid)
+                assert (maze.algorithm, maze.M, maze.N, maze.multiple_paths, maze.braid, maze.seed) == (algorithm, M, N, multiple_paths, braid, seed), f"{context}: got another maze"
+                assert maze.cells == fresh.cells, f"{context}: walls differ from generating the maze"
+
+                after = cached_files(directory)
+                assert path in after, f"{context}: the maze asked for was evicted"
+                assert len(after) == 1 or mazes.size() <= mazes.max_bytes, f"{context}: {mazes.size()} bytes cached, at most {mazes.max_bytes} allowed"
+                evicted, kept = before.keys() - after.keys(), after.keys() - {path}
+                assert not evicted or not kept or max(before[p] for p in evicted) <= min(before[p] for p in kept), f"{context}: evicted a maze used more recently than one kept"
+                queries += 1
+    return queries
+
+def check_batch(rng: random.Random, trials: int, size: int) -> int:
+    """
+    Writes random specs to a batch file through the process pool, unsolved and solved, with
+    a random window of mazes in flight, and reads the records back in order against the
+    same specs generated and solved in process
+    """
+    queries = 0
+    specs = [batch.Spec(rng.choice(GENERATORS), rng.randint(1, size), rng.randint(1, size), rng.random() < .6, rng.choice([*EDGE_SEEDS, rng.getrandbits(63)]), mz.Braid(rng.choice(["density", "dead_ends"]), rng.random()))
+             for _ in range(trials)]
+    with tempfile.TemporaryDirectory() as directory:
+        for solver in (None, rng.choice(["bfs", "dijkstra", "a_star", "bidirectional_bfs", "bidirectional_a_star"])):
+            path, in_flight = os.path.join(directory, f"{solver}.bin"), rng.randint(1, 8)
+            with open(path, "wb") as output:
+                written = batch.run_batch(specs, output, solver, workers=2, in_flight=in_flight)
+            records = list(batch.read_batch(path))
+            assert written == len(records) == len(specs), f"batch solver {solver}: {written} mazes written, {len(records)} read back, {len(specs)} specs"
+            for record, ((maze, solution), spec) in enumerate(zip(records, specs)):
+                context = f"batch solver {solver} in flight {in_flight} record {record} spec {spec}"
+                fresh = mz.Maze(spec.M, spec.N, spec.algorithm, spec.multiple_paths, seed=spec.seed, braid=spec.braid)
+                assert (maze.algorithm, maze.M, maze.N, maze.multiple_paths, maze.seed, maze.braid) == spec, f"{context}: header reads back as another spec"
+                assert bytes(typing.cast(mz.PackedWalls, maze.packed_walls)) == fresh.adjacency(), f"{context}: walls differ from generating the maze"
+                expected = fresh.find_path(solver, (0, 0), (spec.M - 1, spec.N - 1)).path if solver else []
+                assert list(solution) == list(expected), f"{context}: solution differs from solving the maze"
+                if solver:
+                    check_path(fresh, solution, 0, spec.M * spec.N - 1, context)
+                queries += 1
+    return queries
+
+def openings(maze: mz.Maze) -> list[int]:
+    return [len(mz.WALL_BITS[~walls & mz.ALL_WALLS]) for walls in maze.cells]
+
+def check_braid(rng: random.Random, trials: int, size: int) -> int:
+    """
+    Braids random mazes both ways against the perfect maze of the same seed: braiding only
+    opens walls, keeps every cell reachable, a density opens exactly that many walls per cell
+    (as many as are left at most) and a fraction of the dead ends gets rid of that many of
+    them (one more at most) with at most a wall each
+    """
+    queries = 0
+    for trial in range(trials):
+        M, N, algorithm, seed = rng.randint(1, size), rng.randint(1, size), rng.choice(GENERATORS), rng.getrandbits(63)
+        mode = rng.choice(["density", "dead_ends"])
+        braid = mz.Braid(mode, rng.choice([0.0, 1.0, 2.0 if mode == "density" else rng.random(), rng.random()]))
+        context = f"braid trial {trial} {algorithm} {M}x{N} seed {seed} {braid}"
+        perfect, braided = mz.Maze(M, N, algorithm, False, seed=seed), mz.Maze(M, N, algorithm, True, seed=seed, braid=braid)
+        assert all(walls & ~perfect_walls & mz.ALL_WALLS == 0 for walls, perfect_walls in zip(braided.cells, perfect.cells)), f"{context}: braiding built a wall"
+        assert len(bfs_distances(braided, 0)) == M * N, f"{context}: cells cut off"
+        before, after = openings(perfect), openings(braided)
+        opened = (sum(after) - sum(before)) // 2
+        if mode == "density":
+            expected = min(round(braid.amount * M * N), M * (N - 1) + (M - 1) * N - (M * N - 1))
+            assert opened == expected, f"{context}: {opened} walls opened, expected {expected}"
+        else:
+            dead_ends, target = before.count(1), round(braid.amount * before.count(1))
+            assert opened <= target, f"{context}: {opened} walls opened for {target} dead ends"
+            # The last wall broken may take two dead ends, one past the target
+            assert dead_ends - target - 1 <= after.count(1), f"{context}: {after.count(1)} of {dead_ends} dead ends left, braiding {braid.amount:g} of them"
+            if M > 1 and N > 1:
+                assert after.count(1) <= dead_ends - target, f"{context}: {after.count(1)} of {dead_ends} dead ends left, braiding {braid.amount:g} of them"
+        loaded = mz.Maze.from_buffer(braided.to_bytes())
+        assert loaded.braid == braid, f"{context}: loads back braided as {loaded.braid}"
+        queries += 1
+    return queries
+
+CHECKS = {"d_star_lite": check_d_star_lite, "tree_index": check_tree_index, "junction_graph": check_junction_graph, "file_format": check_file_format, "cache": check_cache, "batch": check_batch, "braid": check_braid}
+
+# +++++++++++++++++ MAIN FUNCTION +++++++++++++++++ #
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross check the stateful solvers against BFS on random mazes.")
+    parser.add_argument("--trials", type=int, default=200, help="random mazes per check")
+    parser.add_argument("--size", type=int, default=16, help="largest side of the random mazes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=list(CHECKS), help="run only these checks")
+    args = parser.parse_args()
+
+    for name in args.only or CHECKS:
+        start = time.perf_counter()
+        queries = CHECKS[name](random.Random(f"{args.seed}:{name}"), args.trials, args.size)
+        print(f"{name:<15} {queries:>6} queries ok in {time.perf_counter() - start:.2f}s", file=sys.stderr)
@@ -3,13 +3,21 @@ A Maze generator and solver using python.
 Inspired by this repository: https://github.com/YeyoM/mazeSolver
 """
 
-import random
+import array
 import dataclasses
+import random
+import re
+import struct
 import enum
 import collections
+import contextlib
+import concurrent.futures
 import DSU
 import heapq
-import math
+import itertools
+import mmap
+import sys
+import time
 import typing
 
 class COLORS(enum.Enum):
@@ -18,71 +26,509 @@ class COLORS(enum.Enum):
     current: str = "🟥"
     empty: str = "🟦"
 
-    """
+    def __str__(self) -> str:
+        return self.value
+
+class ASCII_COLORS(enum.Enum):
     wall: str = "#"
     visited: str = "."
     current: str = "@"
     empty: str = " "
-    """
 
     def __str__(self) -> str:
         return self.value
 
+# Codes used while rendering the board, mapped to glyphs only at the very end
+_WALL_CODE, _VISITED_CODE, _EMPTY_CODE = 0, 1, 2
+
+# Bit layout of a single cell in `Maze.cells`. The lower nibble holds
+# the four walls and the spare upper bits hold per cell flags.
+UP, DOWN, LEFT, RIGHT = 1, 2, 4, 8
+ALL_WALLS = UP | DOWN | LEFT | RIGHT
+VISITED = 16
+
+# Wall on the other side of each wall bit and, for every 4 bit mask,
+# the individual wall bits set in it (in a fixed order)
+OPPOSITE: list[int] = [0] * (ALL_WALLS + 1)
+OPPOSITE[UP], OPPOSITE[DOWN], OPPOSITE[LEFT], OPPOSITE[RIGHT] = DOWN, UP, RIGHT, LEFT
+WALL_BITS: list[tuple[int, ...]] = [tuple(bit for bit in (UP, DOWN, LEFT, RIGHT) if mask & bit) for mask in range(ALL_WALLS + 1)]
+
+# Open directions of a cell byte, how many there are and a distance larger than any path
+_OPEN_DIRECTIONS = bytes(~v & ALL_WALLS for v in range(256))
+_OPEN_COUNT = bytes(len(WALL_BITS[v & ALL_WALLS]) for v in range(256))
+_CLEAR_VISITED = bytes(v & ~VISITED for v in range(256))
+UNREACHABLE = 2 ** 31 - 1
+
+# Translation tables used by the batch generators. A coin flip per cell is
+# moved into bit 5 and combined with the in-bounds walls of the cell to pick
+# the walls to break towards the right / lower neighbour.
+_COIN = 32
+_COINS = bytes(_COIN if v & 1 else 0 for v in range(256))
+_RIGHT_TO_LEFT = bytes(LEFT if v & RIGHT else 0 for v in range(256))
+_DOWN_TO_UP = bytes(UP if v & DOWN else 0 for v in range(256))
+_BINARY_TREE = bytes((RIGHT if v & _COIN else DOWN) if v & RIGHT and v & DOWN else v & (RIGHT | DOWN) for v in range(256))
+_SIDEWINDER = bytes(0 if not v & RIGHT else RIGHT if not v & DOWN or v & _COIN else 0 for v in range(256))
+_SIDEWINDER_RUN = re.compile(re.escape(bytes([RIGHT])) + b"*\x00")
+
+# Flags picking out cells with a wall to the right / below and dead ends, used as
+# selectors to collect those cells in batch while braiding
+_HAS_RIGHT = bytes(1 if v & RIGHT else 0 for v in range(256))
+_HAS_DOWN = bytes(1 if v & DOWN else 0 for v in range(256))
+_IS_DEAD_END = bytes(1 if len(WALL_BITS[~v & ALL_WALLS]) == 1 else 0 for v in range(256))
+_SINGLE_OPENING = bytes(1 if v == 1 else 0 for v in range(256))
+_IS_ZERO = bytes(1 if v == 0 else 0 for v in range(256))
+
+# Solvers that don't take pruned walls, they fill dead ends themselves or work
+# off a structure cached across queries (see `Maze.find_path`)
+_UNPRUNED_SOLVERS = ("dead_end_filling", "distance_field", "junction_dijkstra", "junction_a_star", "tree_index", "d_star_lite")
+
+# Walls broken per cell when adding multiple paths, each one closes a loop in a perfect maze
+MULTIPLE_PATHS_DENSITY = 0.1
+
+# Items (edges, junctions) worked through in bulk between two "progress" events
+CHECKPOINT = 1 << 14
+
+# Translation tables from a cell byte to the render code of the cell
+# itself, of the wall to its right and of the wall below it. For the
+# walls bit 5 marks that the neighbour across the wall is visited.
+_NEIGHBOUR_VISITED = 32
+_CELL_CODES = bytes(_VISITED_CODE if v & VISITED else _EMPTY_CODE for v in range(256))
+_VISITED_MARKS = bytes(_NEIGHBOUR_VISITED if v & VISITED else 0 for v in range(256))
+_RIGHT_CODES, _DOWN_CODES = (
+    bytes(_WALL_CODE if v & wall else _VISITED_CODE if v & VISITED and v & _NEIGHBOUR_VISITED else _EMPTY_CODE for v in range(256))
+    for wall in (RIGHT, DOWN)
+)
+
+# Saved maze files: a fixed header (magic, format version, flags, length of the algorithm
+# name, M, N, the seed and the braid amount) followed by the algorithm name and 2 bits
+# per cell, four cells to a byte from the low bits up, for the walls to its right (bit 0) and
+# below it (bit 1). Walls above / left of a cell are the walls below / right of its neighbours.
+# Whether there is a seed at all is a flag. Versions 1 and 2 wrote -1 for no seed instead,
+# and version 1 files have no braid amount, their mazes were all braided by the default density.
+_FILE_MAGIC, _FILE_VERSION = b"MAZE", 3
+_FILE_HEADERS = {1: struct.Struct("<4sBBHIIq"), 2: struct.Struct("<4sBBHIIqd"), 3: struct.Struct("<4sBBHIIqd")}
+_FILE_HEADER = _FILE_HEADERS[_FILE_VERSION]
+_MULTIPLE_PATHS_FLAG, _DEAD_ENDS_FLAG, _SEED_FLAG = 1, 2, 4
+
+# Seeds are saved as signed 64 bit ints, anything else is turned down upfront
+SEEDS = range(-2 ** 63, 2 ** 63)
+_PACK_CODES = bytes((1 if v & RIGHT else 0) | (2 if v & DOWN else 0) for v in range(256))
+_CODE_OPENINGS = bytes((0 if v & 1 else RIGHT) | (0 if v & 2 else DOWN) for v in range(256))
+_PACK_SHIFTS = [bytes((v & 3) << (2 * k) for v in range(256)) for k in range(4)]
+_UNPACK_SHIFTS = [bytes((v >> (2 * k)) & 3 for v in range(256)) for k in range(4)]
+
+def pack_codes(codes: bytes | bytearray) -> bytes:
+    """
+    Packs 2 bit codes four to a byte, from the low bits up. Each position within a byte
+    is shifted in place with one translate and the four merged with big int ORs.
+    """
+    codes = bytes(codes) + bytes(-len(codes) % 4)
+    merged = 0
+    for k in range(4):
+        merged |= int.from_bytes(codes[k::4].translate(_PACK_SHIFTS[k]), "big")
+    return merged.to_bytes(len(codes) // 4, "big")
+
+def unpack_codes(packed: bytes, count: int) -> bytearray:
+    """
+    Spreads out `count` 2 bit codes packed by `pack_codes` to a byte each, one translate
+    and strided slice assignment per position within a byte
+    """
+    codes = bytearray(4 * len(packed))
+    for k in range(4):
+        codes[k::4] = packed.translate(_UNPACK_SHIFTS[k])
+    del codes[count:]
+    return codes
+
 class Cell:
+    """
+    View over a single cell of a bit packed buffer. A standalone cell
+    (constructed without a buffer) owns a buffer of size one. A cell of
+    a maze (see `Maze.grid`) bumps its revision whenever a wall is set,
+    so everything compiled from the walls is rebuilt.
+    """
 
-    @dataclasses.dataclass
     class Wall:
-        up: bool = True
-        down: bool = True
-        left: bool = True
-        right: bool = True
+        """
+        View over the wall bits of a single cell
+        """
+        __slots__ = ("cells", "idx", "maze")
+
+        def __init__(self, cells: bytearray, idx: int, maze: "Maze | None" = None) -> None:
+            self.cells = cells
+            self.idx = idx
+            self.maze = maze
+
+        def _get(self, bit: int) -> bool:
+            return bool(self.cells[self.idx] & bit)
+
+        def _set(self, bit: int, value: bool) -> None:
+            if value:
+                self.cells[self.idx] |= bit
+            else:
+                self.cells[self.idx] &= ~bit
+            if self.maze is not None and bit & ALL_WALLS:
+                self.maze.revision += 1
 
-    def __init__(self, x: int, y: int) -> None:
+        up = property(lambda self: self._get(UP), lambda self, v: self._set(UP, v))
+        down = property(lambda self: self._get(DOWN), lambda self, v: self._set(DOWN, v))
+        left = property(lambda self: self._get(LEFT), lambda self, v: self._set(LEFT, v))
+        right = property(lambda self: self._get(RIGHT), lambda self, v: self._set(RIGHT, v))
+
+        def __eq__(self, other: object) -> bool:
+            if not isinstance(other, Cell.Wall):
+                return NotImplemented
+            return (self.cells[self.idx] & ALL_WALLS) == (other.cells[other.idx] & ALL_WALLS)
+
+        def __repr__(self) -> str:
+            return f"Wall(up={self.up}, down={self.down}, left={self.left}, right={self.right})"
+
+    __slots__ = ("x", "y", "wall")
+
+    def __init__(self, x: int, y: int, cells: bytearray | None = None, idx: int = 0, maze: "Maze | None" = None) -> None:
         self.x = x
         self.y = y
-        self.wall = Cell.Wall()
-        self.visited = False
+        self.wall = Cell.Wall(cells if cells is not None else bytearray([ALL_WALLS]), idx, maze)
+
+    @property
+    def visited(self) -> bool:
+        return self.wall._get(VISITED)
+
+    @visited.setter
+    def visited(self, value: bool) -> None:
+        self.wall._set(VISITED, value)
 
     def __repr__(self) -> str:
         return f"{int(self.wall.up)}{int(self.wall.down)}{int(self.wall.left)}{int(self.wall.right)}"
 
+class Grid:
+    """
+    Read only 2D view over `Maze.cells`, so that `grid[x][y]` keeps
+    returning `Cell` objects without storing one per cell
+    """
+
+    class Row:
+        __slots__ = ("maze", "cells", "x", "N")
+
+        def __init__(self, maze: "Maze", x: int) -> None:
+            self.maze, self.cells, self.x, self.N = maze, maze.cells, x, maze.N
+
+        def __len__(self) -> int:
+            return self.N
+
+        def __getitem__(self, y: int) -> Cell:
+            if y < 0:
+                y += self.N
+            if not 0 <= y < self.N:
+                raise IndexError("grid column out of range")
+            return Cell(self.x, y, self.cells, self.x * self.N + y, self.maze)
+
+        def __iter__(self) -> typing.Iterator[Cell]:
+            return (self[y] for y in range(self.N))
+
+    def __init__(self, maze: "Maze") -> None:
+        self.maze, self.M = maze, maze.M
+
+    def __len__(self) -> int:
+        return self.M
+
+    def __getitem__(self, x: int) -> "Grid.Row":
+        if x < 0:
+            x += self.M
+        if not 0 <= x < self.M:
+            raise IndexError("grid row out of range")
+        return Grid.Row(self.maze, x)
+
+    def __iter__(self) -> typing.Iterator["Grid.Row"]:
+        return (self[x] for x in range(self.M))
+
+class PackedWalls:
+    """
+    Read only view over the walls of a saved maze, straight off the (memory mapped) file.
+    Indexing it with a flat cell index gives the open directions of that cell just like
+    `Maze.adjacency`, only the bytes holding the cell and its upper / left neighbours are read.
+    """
+    def __init__(self, buffer: mmap.mmap | bytes, offset: int, M: int, N: int) -> None:
+        self.buffer, self.offset, self.M, self.N = buffer, offset, M, N
+
+    def __len__(self) -> int:
+        return self.M * self.N
+
+    def code(self, idx: int) -> int:
+        """
+        Right (bit 0) and down (bit 1) walls of a cell as stored in the file
+        """
+        return (self.buffer[self.offset + (idx >> 2)] >> ((idx & 3) << 1)) & 3
+
+    def __getitem__(self, idx: int) -> int:
+        N, code = self.N, self.code(idx)
+        walls = RIGHT if code & 1 or idx % N == N - 1 else 0
+        walls |= DOWN if code & 2 or idx >= len(self) - N else 0
+        walls |= LEFT if idx % N == 0 or self.code(idx - 1) & 1 else 0
+        walls |= UP if idx < N or self.code(idx - N) & 2 else 0
+        return ~walls & ALL_WALLS
+
+    def __bytes__(self) -> bytes:
+        return bytes(self[idx] for idx in range(len(self)))
+
+    @property
+    def end(self) -> int:
+        """
+        Offset right after the last packed byte
+        """
+        return self.offset + (len(self) + 3) // 4
+
+    def packed(self) -> bytes:
+        return self.buffer[self.offset: self.end]
+
+@dataclasses.dataclass
+class Solution:
+    """
+    Result of a solver, the path is kept as flat cell indices (`x * width + y`).
+    Length is the number of steps on the path, None if the destination can't be
+    reached from the source (the path is empty then).
+    """
+    algorithm: str
+    path: array.array
+    width: int
+    length: int | None
+    nodes_expanded: int
+    elapsed: float
+
+    def coordinates(self) -> list[tuple[int, int]]:
+        return [divmod(idx, self.width) for idx in self.path]
+
+# Observers get an event, a flat cell index and a wall bit (0 where it doesn't apply):
+# "break" for a wall broken on the side of that cell ("build" for one put back up), "expand"
+# for a cell (or junction) expanded by a solver, "fill" for a cell filled in as a dead end and
+# "progress" between batches of bulk work, with the number of items done in place of the index
+Observer = typing.Callable[[str, int, int], None]
+
+@dataclasses.dataclass
+class Stats:
+    """
+    Counters and phase timings (in seconds) of the last generator or solver run on a maze.
+    Counters are only tallied where it costs next to nothing, i.e. outside of the hot
+    loops or derived from what the algorithm keeps track of anyway.
+    """
+    algorithm: str
+    counters: dict[str, int] = dataclasses.field(default_factory=dict)
+    phases: dict[str, float] = dataclasses.field(default_factory=dict)
+
+    def count(self, **counters: int) -> None:
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """
+        Times the enclosed block, adding up across repeated phases of the same name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+@dataclasses.dataclass(frozen=True)
+class Braid:
+    """
+    How multiple paths are added to a maze (see `Maze.add_multiple_paths`): "density" breaks
+    amount walls per cell, "dead_ends" gets rid of that fraction of the dead ends
+    """
+    mode: str = "density"
+    amount: float = MULTIPLE_PATHS_DENSITY
+
+    def __post_init__(self) -> None:
+        if self.mode not in ("density", "dead_ends"):
+            raise ValueError(f"Unknown braid mode {self.mode}, expected density or dead_ends")
+
+    def __str__(self) -> str:
+        return f"{self.mode}={self.amount:g}"
+
 class Maze:
-    def __init__(self, M: int, N: int, generator_algorithm: str = "wilson", multiple_paths: bool = True) -> None:
+    def __init__(self, M: int, N: int, generator_algorithm: str = "wilson", multiple_paths: bool = True, tile_size: int | None = None, seed: int | None = None, observer: Observer | None = None, braid: Braid = Braid()) -> None:
+        # Without a seed one is drawn from the global RNG, so every maze can be reproduced
+        if seed is not None and seed not in SEEDS:
+            raise ValueError(f"Seed {seed} doesn't fit in a signed 64 bit int")
+        self.init_state(M, N, generator_algorithm, multiple_paths, seed if seed is not None else random.getrandbits(63), observer, braid)
+        if tile_size and (M > tile_size or N > tile_size):
+            self.generate_tiled(generator_algorithm, tile_size)
+        else:
+            self.generate(generator_algorithm)
+
+    def init_state(self, M: int, N: int, algorithm: str, multiple_paths: bool, seed: int | None, observer: Observer | None, braid: Braid = Braid()) -> None:
+        """
+        Sets up everything but the walls themselves, shared by `__init__` and `load`
+        """
         self.M, self.N = M, N
-        self.multiple_paths = multiple_paths
-        self.generate(generator_algorithm)
+        self.algorithm = algorithm
+        self.multiple_paths, self.braid = multiple_paths, braid
+
+        # Seed the maze was generated from if known, kept along with it in saved files.
+        # Every maze draws from its own RNG, so generating is deterministic for a given
+        # seed and mazes can be generated on several threads at once
+        self.seed = seed
+        self.random = random.Random(seed)
+
+        # Optional callback for every wall broken / cell expanded, generators and
+        # solvers check for it once per step so leaving it unset costs close to nothing
+        self.observer = observer
+        self.stats = Stats(algorithm)
+
+        # Bumped every time walls change, so that anything compiled from
+        # the walls (see `adjacency`) knows when it needs a rebuild
+        self.revision = 0
+        self._adjacency: tuple[int, bytes] | None = None
+        # Distance field (see `distance_field`) of the last destination asked for only,
+        # as (revision, destination, distances, towards), each one is the size of the maze
+        self._distance_field: tuple[int, int, array.array[int], bytearray] | None = None
+        self._junction_graph: JunctionGraph | None = None
+
+        self._tree_index: TreeIndex | None = None
+
+        # Incremental planner towards the last destination asked for, see `replanner`
+        self._replanner: Replanner | None = None
+
+        # A maze loaded from a file keeps its walls packed in the (memory mapped)
+        # file, they are only read into `cells` once the whole maze is needed
+        self._cells: bytearray | None = None
+        self.packed_walls: PackedWalls | None = None
 
-    def break_wall(self, cx: int, cy: int, nx: int, ny: int) -> None:
+    @property
+    def cells(self) -> bytearray:
+        """
+        One byte per cell holding its walls and flags, at flat index `x * N + y`
+        """
+        if self._cells is None:
+            self.load_cells()
+        return typing.cast(bytearray, self._cells)
+
+    @cells.setter
+    def cells(self, cells: bytearray) -> None:
+        self._cells, self.packed_walls = cells, None
+        self.revision += 1
+
+    @property
+    def grid(self) -> Grid:
+        """
+        `Cell` based view over the bit packed `cells` buffer
+        """
+        return Grid(self)
+
+    @staticmethod
+    def wall_bits(cx: int, cy: int, nx: int, ny: int) -> tuple[int, int]:
+        """
+        Returns the wall bit on the current cell and the matching
+        wall bit on the neighbouring cell that separate the two
+        """
         # Down
         if cx < nx:
-            self.grid[cx][cy].wall.down = self.grid[nx][ny].wall.up = False
+            return DOWN, UP
         # Up
         elif cx > nx:
-            self.grid[cx][cy].wall.up = self.grid[nx][ny].wall.down = False
+            return UP, DOWN
         # Right
         elif cy < ny:
-            self.grid[cx][cy].wall.right = self.grid[nx][ny].wall.left = False
+            return RIGHT, LEFT
         # Left
         else:
-            self.grid[cx][cy].wall.left = self.grid[nx][ny].wall.right = False
+            return LEFT, RIGHT
+
+    def break_wall(self, cx: int, cy: int, nx: int, ny: int) -> None:
+        self.revision += 1
+        curr_bit, next_bit = Maze.wall_bits(cx, cy, nx, ny)
+        self.cells[cx * self.N + cy] &= ~curr_bit
+        self.cells[nx * self.N + ny] &= ~next_bit
+        if self.observer:
+            self.observer("break", cx * self.N + cy, curr_bit)
+        if self._replanner:
+            self._replanner.wall_changed(cx * self.N + cy, nx * self.N + ny)
+
+    def build_wall(self, cx: int, cy: int, nx: int, ny: int) -> None:
+        """
+        Puts the wall between two neighbouring cells back up, the counterpart of `break_wall`
+        """
+        self.revision += 1
+        curr_bit, next_bit = Maze.wall_bits(cx, cy, nx, ny)
+        self.cells[cx * self.N + cy] |= curr_bit
+        self.cells[nx * self.N + ny] |= next_bit
+        if self.observer:
+            self.observer("build", cx * self.N + cy, curr_bit)
+        if self._replanner:
+            self._replanner.wall_changed(cx * self.N + cy, nx * self.N + ny)
 
     def has_wall(self, cx: int, cy: int, nx: int, ny: int) -> bool:
-        # Down
-        if cx < nx:
-            assert self.grid[cx][cy].wall.down == self.grid[nx][ny].wall.up
-            return self.grid[cx][cy].wall.down
-        # Up
-        elif cx > nx:
-            assert self.grid[cx][cy].wall.up == self.grid[nx][ny].wall.down
-            return self.grid[cx][cy].wall.up
-        # Right
-        elif cy < ny:
-            assert self.grid[cx][cy].wall.right == self.grid[nx][ny].wall.left
-            return self.grid[cx][cy].wall.right
-        # Left
-        else:
-            assert self.grid[cx][cy].wall.left == self.grid[nx][ny].wall.right
-            return self.grid[cx][cy].wall.left
+        curr_bit, _ = Maze.wall_bits(cx, cy, nx, ny)
+        if self._cells is None and self.packed_walls is not None:
+            return not self.packed_walls[cx * self.N + cy] & curr_bit
+        return bool(self.cells[cx * self.N + cy] & curr_bit)
+
+    def index(self, x: int, y: int) -> int:
+        """
+        Flat index of a cell in `cells`
+        """
+        return x * self.N + y
+
+    def adjacency(self) -> bytes | PackedWalls:
+        """
+        Open directions (wall bits that are broken) of every cell, compiled
+        once from the current walls and cached until the walls next change.
+        A maze loaded from a file that hasn't been read in yet is looked up
+        straight off the file instead.
+        """
+        if self._cells is None and self.packed_walls is not None:
+            return self.packed_walls
+        if self._adjacency is None or self._adjacency[0] != self.revision:
+            with self.stats.phase("adjacency"):
+                self._adjacency = (self.revision, bytes(self.cells).translate(_OPEN_DIRECTIONS))
+        return self._adjacency[1]
+
+    def steps(self) -> list[int]:
+        """
+        Flat index offset to move across each wall bit
+        """
+        step = [0] * (ALL_WALLS + 1)
+        step[UP], step[DOWN], step[LEFT], step[RIGHT] = -self.N, self.N, -1, 1
+        return step
+
+    def inner_walls(self) -> bytearray:
+        """
+        Mask of the walls of every cell that face another cell rather than the
+        border, i.e. the directions one could move in from that cell.
+        Built from three precomputed rows (top, middle, bottom).
+        """
+        M, N = self.M, self.N
+        columns = bytearray((LEFT if y > 0 else 0) | (RIGHT if y < N - 1 else 0) for y in range(N))
+        top, middle, bottom = (bytes(mask | rows for mask in columns) for rows in (DOWN, UP | DOWN, UP))
+        if M == 1:
+            return bytearray(columns)
+        return bytearray(top + middle * (M - 2) + bottom)
+
+    def carve(self, openings: bytes | bytearray) -> None:
+        """
+        Breaks walls for the whole maze in one go. `openings` holds the RIGHT and / or DOWN
+        bits of each cell for the walls to break towards its right / lower neighbour.
+        The matching LEFT / UP bits of the neighbours are lined up by shifting the whole
+        buffer as a big int, border walls are never broken.
+        """
+        size = self.M * self.N
+        own, opened = self.opened_walls(openings)
+        self.cells[:] = (int.from_bytes(self.cells, "big") & ~opened).to_bytes(size, "big")
+        self.revision += 1
+        if self.observer:
+            for idx, bits in enumerate(own.to_bytes(size, "big")):
+                for bit in WALL_BITS[bits]:
+                    self.observer("break", idx, bit)
+
+    def opened_walls(self, openings: bytes | bytearray) -> tuple[int, int]:
+        """
+        Walls broken by `openings` (see `carve`) as big ints over the whole maze:
+        the RIGHT / DOWN bits off the border and those along with the matching LEFT / UP bits
+        """
+        size, N = self.M * self.N, self.N
+        as_int: typing.Callable[[bytes | bytearray], int] = lambda x: int.from_bytes(x, "big")
+        own = as_int(openings) & as_int(self.inner_walls())
+        return own, own | (as_int(own.to_bytes(size, "big").translate(_RIGHT_TO_LEFT)) >> 8) | (as_int(own.to_bytes(size, "big").translate(_DOWN_TO_UP)) >> (8 * N))
 
     def get_neighbours(self, x: int, y: int) -> list[tuple[int, int]]:
         result: list[tuple[int, int]] = []
@@ -96,25 +542,133 @@ class Maze:
         Generate maze based on passed input parameters
         """
 
-        # Init grid for filling in fresh
-        self.grid: list[list[Cell]] = [[Cell(i, j) for j in range(self.N)] for i in range(self.M)]
+        # Init cells for filling in fresh, one byte per cell with all walls up
+        self.cells = bytearray([ALL_WALLS]) * (self.M * self.N)
+        self.algorithm, self.stats = algorithm, Stats(algorithm)
 
         # Generate a maze based on input algorithm
-        if algorithm == "wilson":
-            self.generate_wilson()
-        elif algorithm == "kruskal":
-            self.generate_randomized_kruskal()
-        elif algorithm == "prim":
-            self.generate_randomized_prim()
-        elif algorithm == "ellers":
-            self.generate_ellers()
-        else:
-            self.generate_DFS_BFS()
+        with self.stats.phase("generate"):
+            if algorithm == "wilson":
+                self.generate_wilson()
+            elif algorithm == "kruskal":
+                self.generate_randomized_kruskal()
+            elif algorithm == "prim":
+                self.generate_randomized_prim()
+            elif algorithm == "weighted_prim":
+                self.generate_weighted_prim()
+            elif algorithm == "ellers":
+                self.generate_ellers()
+            elif algorithm == "binary_tree":
+                self.generate_binary_tree()
+            elif algorithm == "sidewinder":
+                self.generate_sidewinder()
+            else:
+                self.generate_DFS_BFS()
+        self.revision += 1
 
         # If multiple paths variable is set to true,
         # modify maze to have multiple solutions
         if self.multiple_paths:
-            self.add_multiple_paths()
+            with self.stats.phase("multiple_paths"):
+                self.add_multiple_paths()
+
+    def generate_tiled(self, algorithm: str, tile_size: int = 512, max_workers: int | None = None) -> None:
+        """
+        Generate very large mazes in parallel across processes.
+
+        Step 1: Split the grid into tiles of (at most) tile_size x tile_size cells.
+
+        Step 2: Generate each tile as a perfect maze of its own in a worker process,
+        using the passed in algorithm. Every tile is seeded from the RNG of this maze.
+
+        Step 3: Copy the tiles into place. Each tile is a single connected component,
+        so a randomized Kruskal's over the edges along the tile borders, with a DSU over
+        the tiles, connects all of them without creating loops.
+        """
+        M, N = self.M, self.N
+        TM, TN = -(-M // tile_size), -(-N // tile_size)
+        self.cells = bytearray([ALL_WALLS]) * (M * N)
+        self.algorithm, self.stats = algorithm, Stats(algorithm)
+
+        # Generate the tiles, filling them in row by row as they come in
+        origins: list[tuple[int, int]] = [(tx * tile_size, ty * tile_size) for tx in range(TM) for ty in range(TN)]
+        specs: list[tuple[int, int, str, int]] = [(min(tile_size, M - x0), min(tile_size, N - y0), algorithm, self.random.getrandbits(63)) for x0, y0 in origins]
+        # Tiles not started yet are dropped should the observer give up (raise) halfway
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers)
+        try:
+            with self.stats.phase("tiles"):
+                for (x0, y0), (rows, cols, _, _), tile in zip(origins, specs, executor.map(_generate_tile, specs)):
+                    for i in range(rows):
+                        self.cells[(x0 + i) * N + y0: (x0 + i) * N + y0 + cols] = tile[i * cols: (i + 1) * cols]
+                        if self.observer:
+                            self.notify_row((x0 + i) * N + y0, cols)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+        # Edges crossing a tile border as `2 * cell + is_down`, along with the tiles they join
+        edges: list[tuple[int, int, int]] = []
+        for y0 in range(tile_size, N, tile_size):
+            for x in range(M):
+                edges.append((2 * (x * N + y0 - 1), (x // tile_size) * TN + (y0 - 1) // tile_size, (x // tile_size) * TN + y0 // tile_size))
+        for x0 in range(tile_size, M, tile_size):
+            for y in range(N):
+                edges.append((2 * ((x0 - 1) * N + y) + 1, ((x0 - 1) // tile_size) * TN + y // tile_size, (x0 // tile_size) * TN + y // tile_size))
+
+        # Stitch the tiles together
+        self.shuffle(edges)
+        dsu: DSU.DisjointSet = DSU.DisjointSet(TM, TN)
+        with self.stats.phase("stitch"):
+            for (edge, _, _), merged in zip(edges, self.union_many(dsu, ((tile1, tile2) for _, tile1, tile2 in edges))):
+                if merged:
+                    curr, bit = edge >> 1, DOWN if edge & 1 else RIGHT
+                    self.cells[curr] &= ~bit
+                    self.cells[curr + (N if edge & 1 else 1)] &= ~OPPOSITE[bit]
+                    if self.observer:
+                        self.observer("break", curr, bit)
+        self.revision += 1
+        self.stats.count(tiles=len(specs), border_edges=len(edges), stitched=TM * TN - 1)
+
+        if self.multiple_paths:
+            with self.stats.phase("multiple_paths"):
+                self.add_multiple_paths()
+
+    def shuffle(self, items: typing.MutableSequence[typing.Any]) -> None:
+        """
+        Fisher-Yates shuffle in place off the RNG of the maze, in batches of `CHECKPOINT`
+        swaps with a "progress" event after each. `random.shuffle` is a single call that
+        takes seconds on the millions of edges of a large maze.
+        """
+        uniform, observer = self.random.random, self.observer
+        for stop in range(len(items) - 1, 0, -CHECKPOINT):
+            for i in range(stop, max(stop - CHECKPOINT, 0), -1):
+                j = int(uniform() * (i + 1))
+                items[i], items[j] = items[j], items[i]
+            if observer:
+                observer("progress", min(CHECKPOINT, stop), 0)
+
+    def union_many(self, dsu: DSU.DisjointSet, pairs: typing.Iterable[tuple[int, int]]) -> list[bool]:
+        """
+        `DisjointSet.union_many` in batches of `CHECKPOINT` pairs with a "progress" event
+        after each, so an observer can follow (and give up on) a long run of unions
+        """
+        if not self.observer:
+            return dsu.union_many(pairs)
+        merged: list[bool] = []
+        pairs = iter(pairs)
+        while batch := list(itertools.islice(pairs, CHECKPOINT)):
+            merged += dsu.union_many(batch)
+            self.observer("progress", len(batch), 0)
+        return merged
+
+    def notify_row(self, start: int, length: int) -> None:
+        """
+        Tells the observer about every wall broken towards the right / lower neighbour
+        within a run of cells filled in wholesale (a row of a tile or of Eller's)
+        """
+        observer, cells = typing.cast(Observer, self.observer), self.cells
+        for idx in range(start, start + length):
+            for bit in WALL_BITS[~cells[idx] & (RIGHT | DOWN)]:
+                observer("break", idx, bit)
 
     def generate_randomized_prim(self) -> None:
         """
@@ -131,30 +685,100 @@ class Maze:
 
         Step 4: Continue until there are no cells left in the frontier set
         """
-        def add_frontiers(x: int, y: int, frontiers: set[tuple[int, int]]) -> None:
-            for x_, y_ in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
-                if 0 <= x_ < self.M and 0 <= y_ < self.N and (x_, y_) not in part_of_maze:
-                    frontiers.add((x_, y_))
-
-        sx, sy = random.randint(0, self.M - 1), random.randint(0, self.N - 1)
-        part_of_maze: set[tuple[int, int]] = {(sx, sy)}
-        frontiers: set[tuple[int, int]] = set()
-        add_frontiers(sx, sy, frontiers)
+        cells, inner, step, rng = self.cells, self.inner_walls(), self.steps(), self.random
+        part_of_maze: bytearray = bytearray(self.M * self.N)
+
+        # Frontier is a list with the position of each cell in it (-1 if absent),
+        # a random frontier is removed by swapping it with the last one and popping
+        frontiers: list[int] = []
+        positions: array.array[int] = array.array('i', [-1]) * (self.M * self.N)
+
+        def add_frontiers(curr: int) -> None:
+            part_of_maze[curr] = 1
+            for bit in WALL_BITS[inner[curr]]:
+                nxt = curr + step[bit]
+                if not part_of_maze[nxt] and positions[nxt] == -1:
+                    positions[nxt] = len(frontiers)
+                    frontiers.append(nxt)
+
+        add_frontiers(self.random.randrange(self.M * self.N))
+        observer, largest = self.observer, len(frontiers)
         while frontiers:
             # Pick a random frontier
-            cx, cy = random.choice(tuple(frontiers))
-            frontiers.remove((cx, cy))
+            idx = rng.randrange(len(frontiers))
+            curr, last = frontiers[idx], frontiers.pop()
+            if last != curr:
+                frontiers[idx], positions[last] = last, idx
 
             # Pick a random neighbour already part of maze
-            nx, ny = random.choice(list(filter(lambda x: x in part_of_maze, self.get_neighbours(cx, cy))))
-            self.break_wall(cx, cy, nx, ny)
+            bit = rng.choice([bit for bit in WALL_BITS[inner[curr]] if part_of_maze[curr + step[bit]]])
+            cells[curr] &= ~bit
+            cells[curr + step[bit]] &= ~OPPOSITE[bit]
+            if observer:
+                observer("break", curr, bit)
 
-            # Add all the neighbouring cells not part of the maze for cx, cy
+            # Add all the neighbouring cells not part of the maze for curr
             # as frontiers themselves
-            part_of_maze.add((cx, cy))
-            add_frontiers(cx, cy, frontiers)
+            add_frontiers(curr)
+            if len(frontiers) > largest:
+                largest = len(frontiers)
+
+        # Every cell but the first joins the frontier exactly once
+        self.stats.count(frontier_adds=self.M * self.N - 1, largest_frontier=largest)
+
+    def generate_weighted_prim(self) -> None:
+        """
+        True randomized Prim's, i.e. a minimum spanning tree over random edge weights.
+
+        Step 1: Mark a random starting cell as part of the maze and push all its edges
+        onto a heap, each with a random weight.
+
+        Step 2: While the heap is not empty, pop the lightest edge. If the cell on the
+        other side is not yet part of the maze, break the wall, mark it as part of the maze
+        and push all its edges leading out of the maze. Else discard the edge.
+
+        Each edge is pushed at most once (by whichever side joins the maze first),
+        so the whole thing runs in O(cells log cells).
+        """
+        cells, inner, step, rng = self.cells, self.inner_walls(), self.steps(), self.random
+        part_of_maze: bytearray = bytearray(self.M * self.N)
+        heap: list[tuple[float, int, int]] = []
+
+        def add_edges(curr: int) -> None:
+            part_of_maze[curr] = 1
+            for bit in WALL_BITS[inner[curr]]:
+                if not part_of_maze[curr + step[bit]]:
+                    heapq.heappush(heap, (rng.random(), curr, bit))
+
+        add_edges(self.random.randrange(self.M * self.N))
+        observer, pops = self.observer, 0
+        while heap:
+            _, curr, bit = heapq.heappop(heap)
+            pops += 1
+            nxt = curr + step[bit]
+            if not part_of_maze[nxt]:
+                cells[curr] &= ~bit
+                cells[nxt] &= ~OPPOSITE[bit]
+                if observer:
+                    observer("break", curr, bit)
+                add_edges(nxt)
+
+        # The heap is drained, so every edge pushed was popped as well
+        self.stats.count(heap_pushes=pops, discarded_edges=pops - (self.M * self.N - 1))
 
     def generate_ellers(self, horizontal_merge_prob: float = 0.5, vertical_merge_prob: float = 0.5) -> None:
+        """
+        Fills in the grid from the rows yielded by `stream_ellers`
+        """
+        N = self.N
+        for i, row in enumerate(Maze.stream_ellers(self.M, self.N, horizontal_merge_prob, vertical_merge_prob, self.random)):
+            self.cells[i * N: (i + 1) * N] = row
+            if self.observer:
+                self.notify_row(i * N, N)
+        self.stats.count(rows=self.M)
+
+    @staticmethod
+    def stream_ellers(M: int, N: int, horizontal_merge_prob: float = 0.5, vertical_merge_prob: float = 0.5, rng: random.Random | None = None) -> typing.Iterator[bytes]:
         """
         Step 1: Iterate row wise.
 
@@ -170,44 +794,72 @@ class Maze:
         Step 6: When on the last row, repeat step 3 but remove the randomness,
         always connecting to the next cell if it's in a different set.
         Don't make any downward connections.
+
+        Yields one finished row at a time as N wall masks (same layout as `Maze.cells`).
+        Only the set labels of the current row are kept, they are relabelled to
+        0..N-1 after every row so memory stays O(N) no matter how large M is.
+        Without an RNG to draw from one is seeded from the global RNG.
         """
-        # DSU to keep track of which set each cell belongs to
-        dsu: DSU.DisjointSet[tuple[int, int]] = DSU.DisjointSet(self.M, self.N)
-        for i in range(self.M):
-
-            # For all rows except the last
-            if i < self.M - 1:
-                # Iterate from left to right, keeping track of set each cell drops into
-                groups: collections.defaultdict[tuple[int, int], list[tuple[int, int]]] = collections.defaultdict(list)
-                for j in range(self.N):
-                    # If current cell and next cell and part of diff sets, randomly choose to join them
-                    if j + 1 < self.N and dsu.get_ultimate_parent((i, j)) != dsu.get_ultimate_parent((i, j + 1)) and random.random() < horizontal_merge_prob:
-                        dsu.union((i, j), (i, j + 1))
-                        self.break_wall(i, j, i, j + 1)
-                    groups[dsu.get_ultimate_parent((i, j))].append((i, j))
-
-                # Make sure that from each group atleast one cell has a open door downwards
-                for group in groups.values():
-                    random.shuffle(group)
-                    cx, cy = group.pop()
-
-                    # Mandatorily ensure atleast one cell has opening downwards
-                    self.break_wall(cx, cy, cx + 1, cy)
-                    dsu.union((cx, cy), (cx + 1, cy))
-
-                    # Randomly break wall downwards for same group
-                    for cx, cy in group:
-                        if random.random() < vertical_merge_prob:
-                            self.break_wall(cx, cy, cx + 1, cy)
-                            dsu.union((cx, cy), (cx + 1, cy))
-
-            # For the last row, ensure that all disjoint sets are connected
-            else:
-                for j in range(self.N - 1):
-                    # If disjoint, no randomness simply join them together
-                    if dsu.get_ultimate_parent((i, j)) != dsu.get_ultimate_parent((i, j + 1)):
-                        dsu.union((i, j), (i, j + 1))
-                        self.break_wall(i, j, i, j + 1)
+        rng = rng if rng is not None else random.Random(random.getrandbits(63))
+        # Set label of each cell in the current row and cells with an opening from above
+        labels: list[int] = list(range(N))
+        opened_above: bytearray = bytearray(N)
+        for i in range(M):
+            row = bytearray([ALL_WALLS]) * N
+            for j in range(N):
+                if opened_above[j]:
+                    row[j] &= ~UP
+
+            # DSU over the labels of this row, to keep track of which set each cell belongs to
+            # For the last row, ensure that all disjoint sets are connected without any randomness
+            dsu: DSU.DisjointSet = DSU.DisjointSet(1, N)
+            for j in range(N - 1):
+                ulp1, ulp2 = dsu.get_ultimate_parent(labels[j]), dsu.get_ultimate_parent(labels[j + 1])
+                if ulp1 != ulp2 and (i == M - 1 or rng.random() < horizontal_merge_prob):
+                    dsu.union(ulp1, ulp2)
+                    row[j] &= ~RIGHT
+                    row[j + 1] &= ~LEFT
+
+            if i == M - 1:
+                yield bytes(row)
+                break
+
+            # Keep track of set each cell drops into, only once the row is done
+            # since union by rank may change the root of a set while merging
+            roots: list[int] = [dsu.get_ultimate_parent(label) for label in labels]
+            groups: collections.defaultdict[int, list[int]] = collections.defaultdict(list)
+            for j, root in enumerate(roots):
+                groups[root].append(j)
+
+            # Make sure that from each group atleast one cell has a open door downwards
+            opened_above = bytearray(N)
+            for group in groups.values():
+                rng.shuffle(group)
+
+                # Mandatorily ensure atleast one cell has opening downwards
+                opened_above[group.pop()] = 1
+
+                # Randomly break wall downwards for same group
+                for j in group:
+                    if rng.random() < vertical_merge_prob:
+                        opened_above[j] = 1
+
+            for j in range(N):
+                if opened_above[j]:
+                    row[j] &= ~DOWN
+            yield bytes(row)
+
+            # Relabel sets for the next row: cells connected from above keep their
+            # set (renumbered compactly), the rest start off in a set of their own
+            relabel: dict[int, int] = {}
+            for j in range(N):
+                if opened_above[j]:
+                    labels[j] = relabel.setdefault(roots[j], len(relabel))
+            fresh = len(relabel)
+            for j in range(N):
+                if not opened_above[j]:
+                    labels[j] = fresh
+                    fresh += 1
 
     def generate_randomized_kruskal(self) -> None:
         """
@@ -229,25 +881,72 @@ class Maze:
 
         Step 5: Continue until all edges have been processed
         """
-        dsu: DSU.DisjointSet[tuple[int, int]] = DSU.DisjointSet(self.M, self.N)
-        # Store all the edges that could be removed
-        edges: list[tuple[tuple[int, int], tuple[int, int]]] = []
-        for x in range(self.M):
-            for y in range(self.N):
-                for x_, y_ in [(x + 1, y), (x, y + 1)]:
-                    if 0 <= x_ < self.M and 0 <= y_ < self.N:
-                        edges.append(((x, y), (x_, y_)))
-
-        # Randomly pop edges
-        random.shuffle(edges)
-        while edges:
-            (cx, cy), (nx, ny) = edges.pop()
-            # We only remove the wall between the cells 
-            # if they are not already part of same `set`
-            # This is done so that the maze doesn't have
-            # any loops
-            if dsu.union((cx, cy), (nx, ny)):
-                self.break_wall(cx, cy, nx, ny)
+        M, N = self.M, self.N
+        dsu: DSU.DisjointSet = DSU.DisjointSet(M, N)
+        # Store all the edges that could be removed as integers `2 * cell + is_down`,
+        # built a row of edges at a time from ranges
+        edges: array.array[int] = array.array('i')
+        for x in range(M):
+            edges.extend(range(2 * x * N, 2 * (x * N + N - 1), 2))
+            if x + 1 < M:
+                edges.extend(range(2 * x * N + 1, 2 * (x + 1) * N, 2))
+
+        # Randomly order the edges and union them in bulk. We only remove
+        # the wall between the cells if they are not already part of same
+        # `set`, this is done so that the maze doesn't have any loops
+        self.shuffle(edges)
+        pairs = ((edge >> 1, (edge >> 1) + (N if edge & 1 else 1)) for edge in edges)
+        openings = bytearray(M * N)
+        merges = self.union_many(dsu, pairs)
+        for edge, merged in zip(edges, merges):
+            if merged:
+                openings[edge >> 1] |= DOWN if edge & 1 else RIGHT
+        self.carve(openings)
+        self.stats.count(edges=len(edges), unions=sum(merges))
+
+    def generate_binary_tree(self) -> None:
+        """
+        Step 1: For every cell flip a coin and break either the wall to its right
+        or the wall below it.
+
+        Step 2: Cells on the last row can only go right and cells on the last column
+        can only go down, the bottom right cell breaks nothing.
+
+        Every cell is decided independently, so the choices for the whole maze are
+        made in a single pass over a buffer of random bytes and carved in one go.
+        """
+        size = self.M * self.N
+        coins = int.from_bytes(self.random.randbytes(size).translate(_COINS), "big")
+        inner = int.from_bytes(self.inner_walls(), "big")
+        self.carve((coins | inner).to_bytes(size, "big").translate(_BINARY_TREE))
+
+    def generate_sidewinder(self) -> None:
+        """
+        Step 1: Going through each row from left to right, flip a coin for each cell
+        to decide if the current run of cells carries on to the right.
+
+        Step 2: When a run ends (coin says so or the row ends), break the wall below
+        one random cell of the run.
+
+        Step 3: The last row is one single run going all the way to the right.
+
+        Coin flips for the whole maze are made in one pass, the runs of a row are
+        found with a regex and only the cell opening downwards is picked per run.
+        """
+        M, N, size = self.M, self.N, self.M * self.N
+        coins = int.from_bytes(self.random.randbytes(size).translate(_COINS), "big")
+        inner = int.from_bytes(self.inner_walls(), "big")
+        openings = bytearray((coins | inner).to_bytes(size, "big").translate(_SIDEWINDER))
+        runs = 0
+        for x in range(M - 1):
+            for run in _SIDEWINDER_RUN.finditer(openings, x * N, (x + 1) * N):
+                start, end = run.span()
+                openings[start + int(self.random.random() * (end - start))] |= DOWN
+                runs += 1
+            if self.observer:
+                self.observer("progress", N, 0)
+        self.carve(openings)
+        self.stats.count(runs=runs)
 
     def generate_wilson(self) -> None:
         """
@@ -269,30 +968,54 @@ class Maze:
 
         Step 4: Continue until there are no unvisited cells left
         """
-        part_of_maze: set[tuple[int, int]] = {(random.randint(0, self.M - 1), random.randint(0, self.N - 1))}
-        unvisited: set[tuple[int, int]] = {(i, j) for i in range(self.M) for j in range(self.N) if (i, j) not in part_of_maze}
+        cells, inner, step, rng = self.cells, self.inner_walls(), self.steps(), self.random
+        part_of_maze: bytearray = bytearray(self.M * self.N)
+
+        # Indexable pool of cells not yet part of the maze. A cell joining the maze
+        # is swapped with the last element and popped, so picks and removals are O(1)
+        unvisited: list[int] = list(range(self.M * self.N))
+        positions: array.array[int] = array.array('i', unvisited)
+
+        def add_to_maze(curr: int) -> None:
+            part_of_maze[curr] = 1
+            last = unvisited.pop()
+            if last != curr:
+                unvisited[positions[curr]] = last
+                positions[last] = positions[curr]
+
+        add_to_maze(self.random.randrange(self.M * self.N))
+
+        # Wall crossed while last leaving each cell on the current random walk
+        directions: bytearray = bytearray(self.M * self.N)
+        observer, walks, walk_steps = self.observer, 0, 0
         while unvisited:
-            # Pick a random coord and continue visiting random neighbours
+            # Pick a random cell and continue visiting random neighbours
             # until we visit a node that is already part of the maze
-            sx, sy = cx, cy = next(iter(unvisited))
-            visited: dict[tuple[int, int], tuple[int, int]] = {}
-            while (cx, cy) not in part_of_maze:
-                nx, ny = random.choice(self.get_neighbours(cx, cy))
-                visited[(cx, cy)] = (nx, ny)
-                cx, cy = nx, ny
-
-            # Starting from sx, sy - visit the final node part
+            start = curr = unvisited[rng.randrange(len(unvisited))]
+            while not part_of_maze[curr]:
+                bit = rng.choice(WALL_BITS[inner[curr]])
+                directions[curr] = bit
+                curr += step[bit]
+                walk_steps += 1
+                # The first walks into a large maze take millions of steps, these check
+                # in with the observer now and then without getting the maze any closer
+                if observer and not walk_steps % CHECKPOINT:
+                    observer("progress", 0, 0)
+            walks += 1
+
+            # Starting from start - visit the final node part
             # of the maze clearing all walls in between
-            cx, cy = sx, sy
-            while (cx, cy) not in part_of_maze:
-                unvisited.remove((cx, cy))
-                part_of_maze.add((cx, cy))
-                nx, ny = visited[(cx, cy)]
-
-                # Break the wall between these two points
-                self.break_wall(cx, cy, nx, ny)
-
-                cx, cy = nx, ny
+            curr = start
+            while not part_of_maze[curr]:
+                bit = directions[curr]
+                nxt = curr + step[bit]
+                cells[curr] &= ~bit
+                cells[nxt] &= ~OPPOSITE[bit]
+                if observer:
+                    observer("break", curr, bit)
+                add_to_maze(curr)
+                curr = nxt
+        self.stats.count(walks=walks, walk_steps=walk_steps)
 
     def generate_DFS_BFS(self, split_percent: float = 0.5) -> None:
         """
@@ -304,7 +1027,7 @@ class Maze:
         Step 3: Keep iterating until there are elements left to visit.
         """
         unvisited: set[tuple[int, int]] = {(i, j) for j in range(self.N) for i in range(self.M)}
-        to_visit: collections.deque[tuple[int, int]] = collections.deque([(random.randint(0, self.M - 1), random.randint(0, self.N - 1))])
+        to_visit: collections.deque[tuple[int, int]] = collections.deque([(self.random.randint(0, self.M - 1), self.random.randint(0, self.N - 1))])
         unvisited.remove(to_visit[-1])
         while to_visit:
             cx, cy = to_visit[-1]
@@ -313,11 +1036,11 @@ class Maze:
                 to_visit.pop()
             else:
                 # Randomly pick an unvisited neighbour
-                nx, ny = random.choice(unvisited_neighbours)
+                nx, ny = self.random.choice(unvisited_neighbours)
                 unvisited.remove((nx, ny))
 
                 # Randomly switch between DFS / BFS
-                if random.random() < split_percent:
+                if self.random.random() < split_percent:
                     to_visit.append((nx, ny))
                 else:
                     to_visit.appendleft((nx, ny))
@@ -325,79 +1048,197 @@ class Maze:
                 # Break the wall between these two points
                 self.break_wall(cx, cy, nx, ny)
 
-    def add_multiple_paths(self, trials: int|None = None) -> None:
+    def add_multiple_paths(self, trials: int | None = None, density: float | None = None, dead_ends: float | None = None) -> None:
         """
-        Randomly selects a cell and tries to break down a wall in an attempt to create
-        additional paths to the existing single path maze solution
+        Braids the maze, i.e. breaks extra walls to create additional paths to the existing
+        single path maze solution. Breaks either exactly `trials` walls, `density` walls per cell
+        or gets rid of the given fraction of dead ends. By default braids as `self.braid` says.
         """
-        if not trials:
-            trials = int(0.1 * self.M * self.N)
+        if trials is None and density is None and dead_ends is None:
+            density, dead_ends = (None, self.braid.amount) if self.braid.mode == "dead_ends" else (self.braid.amount, None)
+        if dead_ends is not None:
+            self.braid_dead_ends(dead_ends)
+        else:
+            self.braid_walls(trials if trials is not None else round((MULTIPLE_PATHS_DENSITY if density is None else density) * self.M * self.N))
 
-        assert trials <= self.M * self.N
-        while trials:
-            cx, cy = random.randint(0, self.M - 1), random.randint(0, self.N - 1)
-            neighbours_with_walls = list(filter(lambda x: self.has_wall(x[0], x[1], cx, cy), self.get_neighbours(cx, cy)))
-            if neighbours_with_walls:
-                nx, ny = random.choice(neighbours_with_walls)
-                self.break_wall(cx, cy, nx, ny)
-                trials -= 1
+    def braid_walls(self, count: int) -> None:
+        """
+        Step 1: Collect every wall still up between two cells into a pool, as `2 * cell + is_down`.
+        The cells with a wall to the right / below are picked out in batch.
+
+        Step 2: Pick a random wall from the pool and break it. It is swapped with the last
+        wall of the pool and popped, so every wall takes O(1) no matter how few are left.
 
-    def solve(self, algorithm: str, source: tuple[int, int], dest: tuple[int, int]) -> None:
+        Step 3: Repeat until count walls are broken or none are left (a 1 x N maze has none).
+        """
+        size, rng = self.M * self.N, self.random
+        up = (int.from_bytes(self.cells, "big") & int.from_bytes(self.inner_walls(), "big")).to_bytes(size, "big")
+        pool: array.array[int] = array.array('i', itertools.compress(range(0, 2 * size, 2), up.translate(_HAS_RIGHT)))
+        pool.extend(itertools.compress(range(1, 2 * size, 2), up.translate(_HAS_DOWN)))
+
+        openings, breaks, uniform = bytearray(size), min(count, len(pool)), rng.random
+        for _ in range(breaks):
+            idx = int(uniform() * len(pool))
+            edge = pool[idx]
+            pool[idx] = pool[-1]
+            pool.pop()
+            openings[edge >> 1] |= DOWN if edge & 1 else RIGHT
+        self.carve(openings)
+        self.stats.count(braided_walls=breaks)
+
+    def braid_dead_ends(self, fraction: float) -> None:
+        """
+        Step 1: Collect all the dead ends (cells with a single way out) into a pool,
+        keeping track of the position of each one in it.
+
+        Step 2: Pick a random dead end and break one of its walls towards another cell,
+        preferring a neighbour that is a dead end itself so one wall gets rid of both.
+        Either leaves the pool by being swapped with the last dead end and popped, O(1).
+
+        Step 3: Repeat until the given fraction of the dead ends there were is gone.
+        """
+        cells, inner, step, rng = self.cells, self.inner_walls(), self.steps(), self.random
+        degree: bytearray = bytearray(bytes(cells).translate(_OPEN_DIRECTIONS).translate(_OPEN_COUNT))
+        pool: list[int] = list(itertools.compress(range(self.M * self.N), bytes(cells).translate(_IS_DEAD_END)))
+        positions: array.array[int] = array.array('i', [-1]) * (self.M * self.N)
+        for pos, idx in enumerate(pool):
+            positions[idx] = pos
+
+        def remove(idx: int) -> None:
+            pos, last = positions[idx], pool.pop()
+            if last != idx:
+                pool[pos], positions[last] = last, pos
+            positions[idx] = -1
+
+        observer, target, removed = self.observer, round(fraction * len(pool)), 0
+        while pool and removed < target:
+            curr = pool[rng.randrange(len(pool))]
+            remove(curr)
+            walls = WALL_BITS[cells[curr] & inner[curr]]
+            if not walls:
+                continue
+            bit = rng.choice([bit for bit in walls if degree[curr + step[bit]] == 1] or walls)
+            nxt = curr + step[bit]
+            cells[curr] &= ~bit
+            cells[nxt] &= ~OPPOSITE[bit]
+            degree[curr] += 1
+            degree[nxt] += 1
+            removed += 1
+            if positions[nxt] != -1:
+                remove(nxt)
+                removed += 1
+            if observer:
+                observer("break", curr, bit)
+        self.revision += 1
+        self.stats.count(braided_dead_ends=removed)
+
+    def solve(self, algorithm: str, source: tuple[int, int], dest: tuple[int, int]) -> "Solution":
+        """
+        Solve maze based on input algorithm passed and mark the path as visited on the grid.
+        Thin wrapper over `find_path` + `overlay`, use `unsolve` or `clear` to remove the marks.
+        """
+        solution = self.find_path(algorithm, source, dest)
+        self.overlay(solution)
+        return solution
+
+    def find_path(self, algorithm: str, source: tuple[int, int], dest: tuple[int, int], prune: bool = False) -> "Solution":
         """
         Solve maze based on input algorithm passed
         By default we assume curr to be the first empty cell and dest to be the last empty cell
+        Doesn't touch the grid, so any number of solvers can run on the same maze.
+        With prune the dead ends are filled in first (see `fill_dead_ends`) and the solvers
+        stepping from cell to cell search only what is left. Those working off a structure
+        cached across queries (junction graph, distance field, tree index, D* Lite) ignore it.
         """
-        if algorithm == "dijkstra":
-            self.solve_dijkstra(source, dest)
-        elif algorithm == "a_star":
-            self.solve_a_star(source, dest)
-        elif algorithm == "dead_end_filling":
-            self.solve_dead_end_filling(source, dest)
-        else:
-            self.solve_DFS_BFS(source, dest)
+        self.stats = Stats(algorithm)
+        start = time.perf_counter()
+        with self.stats.phase("find_path"):
+            adjacency: bytes | None = None
+            if prune and algorithm not in _UNPRUNED_SOLVERS:
+                with self.stats.phase("fill_dead_ends"):
+                    adjacency, _ = self.fill_dead_ends((self.index(*source), self.index(*dest)))
+            if algorithm == "dijkstra":
+                path, expanded = self.solve_dijkstra(source, dest, adjacency)
+            elif algorithm == "a_star":
+                path, expanded = self.solve_a_star(source, dest, adjacency)
+            elif algorithm == "bidirectional_bfs":
+                path, expanded = self.solve_bidirectional_BFS(source, dest, adjacency)
+            elif algorithm == "bidirectional_a_star":
+                path, expanded = self.solve_bidirectional_a_star(source, dest, adjacency)
+            elif algorithm in ("junction_dijkstra", "junction_a_star"):
+                # Building the graph (on the first query after the walls change) touches every cell
+                built = self._junction_graph is None or self._junction_graph.revision != self.revision
+                path, expanded = self.junction_graph().path(self.index(*source), self.index(*dest), use_heuristic=algorithm == "junction_a_star")
+                expanded += self.M * self.N if built else 0
+            elif algorithm == "d_star_lite":
+                replanner = self.replanner(dest)
+                path, expanded = replanner.path(source), replanner.expanded
+            elif algorithm == "tree_index":
+                # Building the index walks every cell, a query on its own only the path
+                built = self._tree_index is None or self._tree_index.revision != self.revision
+                path = self.tree_index().path(self.index(*source), self.index(*dest))
+                expanded = len(path) + (self.M * self.N if built else 0)
+            elif algorithm == "dead_end_filling":
+                path, expanded = self.solve_dead_end_filling(source, dest)
+            elif algorithm == "distance_field":
+                path, expanded = self.solve_distance_field(source, dest)
+            else:
+                path, expanded = self.solve_DFS_BFS(source, dest, adjacency=adjacency)
+        length = len(path) - 1 if path else None
+        self.stats.count(nodes_expanded=expanded)
+        if length is not None:
+            self.stats.count(path_length=length)
+        return Solution(algorithm, array.array('i', path), self.N, length, expanded, time.perf_counter() - start)
+
+    def overlay(self, solution: "Solution") -> None:
+        """
+        Marks the path of a solution as visited, only touches the cells on the path
+        """
+        cells = self.cells
+        for idx in solution.path:
+            cells[idx] |= VISITED
+
+    def clear(self, solution: "Solution") -> None:
+        """
+        Removes the visited marks of a solution, only touches the cells on the path
+        """
+        cells = self.cells
+        for idx in solution.path:
+            cells[idx] &= ~VISITED
 
     def unsolve(self) -> None:
         """
         Removes all visited hints from the grid
         """
-        for i in range(self.M):
-            for j in range(self.N):
-                self.grid[i][j].visited = False
+        self.cells[:] = self.cells.translate(_CLEAR_VISITED)
 
-    def solve_DFS_BFS(self, source: tuple[int, int], destination: tuple[int, int], mode: str = "BFS") -> None:
+    def solve_DFS_BFS(self, source: tuple[int, int], destination: tuple[int, int], mode: str = "BFS", adjacency: bytes | PackedWalls | None = None) -> tuple[list[int], int]:
         # While to_visit not empty keep visiting all unvisited neighbours
-        # stopping if we encounter the destination node
-        to_visit: collections.deque[tuple[int, int]] = collections.deque([source])
-        prev_visited: dict[tuple[int, int], tuple[int, int]] = {source: source}
+        # stopping if we encounter the destination node.
+        # Searches the passed in open directions (e.g. pruned ones) instead of the maze's if any
+        adjacency, step = self.adjacency() if adjacency is None else adjacency, self.steps()
+        src, dest = self.index(*source), self.index(*destination)
+        to_visit: collections.deque[int] = collections.deque([src])
+        prev_visited: array.array[int] = array.array('i', [-1]) * (self.M * self.N)
+        prev_visited[src] = src
+        observer, expanded = self.observer, 0
         while to_visit:
             curr = to_visit.pop() if mode == "DFS" else to_visit.popleft()
-            if curr == (self.M - 1, self.N - 1):
+            if curr == dest:
                 break
-            else:
-                x, y = curr
-                neighbours: list[tuple[int, int]] = []
-                if not self.grid[x][y].wall.down:
-                    neighbours.append((x + 1, y))
-                if not self.grid[x][y].wall.up:
-                    neighbours.append((x - 1, y))
-                if not self.grid[x][y].wall.left:
-                    neighbours.append((x, y - 1))
-                if not self.grid[x][y].wall.right:
-                    neighbours.append((x + 1, y + 1))
-                for neighbour in neighbours:
-                    if neighbour not in prev_visited:
-                        to_visit.append(neighbour)
-                        prev_visited[neighbour] = curr
-
-        # Mark the shortest path from destination to source as visited
-        curr = destination
-        x, y = curr
-        self.grid[x][y].visited = True
-        while curr != source:
-            curr = prev_visited[curr]
-            self.grid[x][y].visited = True
-
-    def solve_dijkstra(self, source: tuple[int, int], destination: tuple[int, int]) -> None:
+            expanded += 1
+            if observer:
+                observer("expand", curr, 0)
+            for bit in WALL_BITS[adjacency[curr]]:
+                nxt = curr + step[bit]
+                if prev_visited[nxt] == -1:
+                    to_visit.append(nxt)
+                    prev_visited[nxt] = curr
+
+        # Trace back the shortest path from destination to source
+        return self.trace_path(prev_visited, src, dest), expanded
+
+    def solve_dijkstra(self, source: tuple[int, int], destination: tuple[int, int], adjacency: bytes | PackedWalls | None = None) -> tuple[list[int], int]:
         """
         This algorithm only makes sense when there are multiple paths between source and destination.
         Would still work for unique paths but would function the same as a BFS and would be overkill (slower due to log N ops)
@@ -407,28 +1248,36 @@ class Maze:
         Step 3: Iterate through all possible neighbours of curr node that could be visited, add to the heap only if the cost + 1 is lesser than the existing path already discovered.
         Step 4: Repeat until destination is reached.
         """
-        heap: list[tuple[float, tuple[int, int]]] = [(0, source)]
-        distances: collections.defaultdict[tuple[int, int], float] = collections.defaultdict(lambda: math.inf, {source: 0})
-        prev_visited: dict[tuple[int, int], tuple[int, int]] = {}
+        adjacency, step = self.adjacency() if adjacency is None else adjacency, self.steps()
+        src, dest = self.index(*source), self.index(*destination)
+        heap: list[tuple[int, int]] = [(0, src)]
+        distances: array.array[int] = array.array('i', [UNREACHABLE]) * (self.M * self.N)
+        distances[src] = 0
+        prev_visited: array.array[int] = array.array('i', [-1]) * (self.M * self.N)
+        observer, expanded, stale = self.observer, 0, 0
         while heap:
-            cost, (cx, cy) = heapq.heappop(heap)
-            neighbours_without_walls = list(filter(lambda x: not self.has_wall(x[0], x[1], cx, cy), self.get_neighbours(cx, cy)))
-            for (nx, ny) in neighbours_without_walls:
-                if distances[(nx, ny)] > cost + 1:
-                    distances[(nx, ny)] = cost + 1
-                    prev_visited[(nx, ny)] = (cx, cy)
-                    heapq.heappush(heap, (cost + 1, (nx, ny)))
-            if (cx, cy) == destination:
+            cost, curr = heapq.heappop(heap)
+            if curr == dest:
                 break
-
-        # Mark the shortest path from destination to source as visited
-        cx, cy = destination
-        self.grid[cx][cy].visited = True
-        while (cx, cy) != source:
-            cx, cy = prev_visited[(cx, cy)]
-            self.grid[cx][cy].visited = True
-
-    def solve_a_star(self, source: tuple[int, int], destination: tuple[int, int]) -> None:
+            # Skip stale entries, node was already reached with a lower cost
+            if cost > distances[curr]:
+                stale += 1
+                continue
+            expanded += 1
+            if observer:
+                observer("expand", curr, 0)
+            for bit in WALL_BITS[adjacency[curr]]:
+                nxt = curr + step[bit]
+                if distances[nxt] > cost + 1:
+                    distances[nxt] = cost + 1
+                    prev_visited[nxt] = curr
+                    heapq.heappush(heap, (cost + 1, nxt))
+        self.count_heap(expanded, stale, len(heap), curr == dest)
+
+        # Trace back the shortest path from destination to source
+        return self.trace_path(prev_visited, src, dest), expanded
+
+    def solve_a_star(self, source: tuple[int, int], destination: tuple[int, int], adjacency: bytes | PackedWalls | None = None) -> tuple[list[int], int]:
         """
         Same as dijkstra but uses a hueristic to find the destination quicker.
         While dijkstra keeps track of just the cost to reach curr from source,
@@ -438,117 +1287,961 @@ class Maze:
         Heuristic = approximation
         Video explanation: https://www.youtube.com/watch?v=ySN5Wnu88nE (computerphile)
         """
+        adjacency, step, N = self.adjacency() if adjacency is None else adjacency, self.steps(), self.N
+        src, dest = self.index(*source), self.index(*destination)
+        dx, dy = destination
+
         # Using manhattan distance for heuristic calculation (H value)
-        dist: typing.Callable[[tuple[int, int], tuple[int, int]], float] = lambda x, y: abs(x[0] - y[0]) + abs(x[1] - y[1])
+        dist: typing.Callable[[int], int] = lambda x: abs(x // N - dx) + abs(x % N - dy)
 
         # Same as dijkstra but include cost to destination as well
-        distances: collections.defaultdict[tuple[int, int], float] = collections.defaultdict(lambda: math.inf, {source: 0})
-        prev_visited: dict[tuple[int, int], tuple[int, int]] = dict()
-        heap: list[tuple[float, float, tuple[int, int]]] = [(dist(source, destination), 0, source)]
+        distances: array.array[int] = array.array('i', [UNREACHABLE]) * (self.M * self.N)
+        distances[src] = 0
+        prev_visited: array.array[int] = array.array('i', [-1]) * (self.M * self.N)
+        heap: list[tuple[int, int, int]] = [(dist(src), 0, src)]
+        observer, expanded, stale = self.observer, 0, 0
         while heap:
-            heuristic, cost, (cx, cy) = heapq.heappop(heap)
-            neighbours_without_walls = list(filter(lambda x: not self.has_wall(x[0], x[1], cx, cy), self.get_neighbours(cx, cy)))
-            for (nx, ny) in neighbours_without_walls:
-                if distances[(nx, ny)] > cost + 1:
-                    distances[(nx, ny)] = cost + 1
-                    prev_visited[(nx, ny)] = (cx, cy)
-                    heapq.heappush(heap, (dist((nx, ny), destination) + cost + 1, cost + 1, (nx, ny)))
-            if (cx, cy) == destination:
+            heuristic, cost, curr = heapq.heappop(heap)
+            if curr == dest:
                 break
-
-        # Mark the shortest path from destination to source as visited
-        cx, cy = destination
-        self.grid[cx][cy].visited = True
-        while (cx, cy) != source:
-            cx, cy = prev_visited[(cx, cy)]
-            self.grid[cx][cy].visited = True
-
-    def solve_dead_end_filling(self, source: tuple[int, int], destination: tuple[int, int]) -> None:
-        """"
-        Step 1. Identify Dead-Ends:
-           - Traverse through the maze grid and identify all cells that are dead-ends.
-           - A dead-end is defined as a cell surrounded by walls on three sides.
-           - Exclude the source and destination cells from being marked as dead-ends.
-
-        Step 2. Fill Non-Path Cells:
-           - For each identified dead-end, trace back towards the nearest junction (a cell with more than one open path).
-           - As you trace back, mark each cell as a non-path cell until you reach the junction.
-           - This step effectively "fills in" dead-end paths that cannot lead to the destination.
-
-        Step 3. Mark Valid Path Cells:
-           - After processing all dead-ends, mark only the cells that are not part of the non-path set as valid path cells.
-           - These cells are considered part of the solution and will be marked as visited.
-       """
-
-        source, destination = (0, 0), (self.M - 1, self.N - 1)
-
-        # Check if the cell is a deadend (surrounded by wall on 3 sides)
-        is_deadend: typing.Callable[[Cell], bool] = lambda x: sum((x.wall.up, x.wall.down, x.wall.left, x.wall.right)) == 3
-        deadends: list[tuple[int, int]] = [(i, j) for i in range(self.M) for j in range(self.N) if is_deadend(self.grid[i][j]) and (i, j) != source and (i, j) != destination]
-
-        # While there are deadends, pop from deadends and start filling until a first junction is hit
-        non_path: set[tuple[int, int]] = set()
+            if cost > distances[curr]:
+                stale += 1
+                continue
+            expanded += 1
+            if observer:
+                observer("expand", curr, 0)
+            for bit in WALL_BITS[adjacency[curr]]:
+                nxt = curr + step[bit]
+                if distances[nxt] > cost + 1:
+                    distances[nxt] = cost + 1
+                    prev_visited[nxt] = curr
+                    heapq.heappush(heap, (dist(nxt) + cost + 1, cost + 1, nxt))
+        self.count_heap(expanded, stale, len(heap), curr == dest)
+
+        # Trace back the shortest path from destination to source
+        return self.trace_path(prev_visited, src, dest), expanded
+
+    def fill_dead_ends(self, keep: typing.Iterable[int] = (), towards: bytearray | None = None) -> tuple[bytes, int]:
+        """
+        Step 1: Find all the dead ends (cells with a single way out) in one batch pass over
+        the walls and count the open directions of every cell. Cells in keep are never filled.
+
+        Step 2: Fill dead ends off a work queue. Filling a cell closes its only way out, and
+        the cell it led to becomes a dead end of its own (and is queued) once it is down
+        to a single way out as well.
+
+        Every cell is queued at most once, so this runs in O(M * N) however long the corridors.
+        Returns the open directions of every cell with the filled cells walled off,
+        leaving just the loops and the corridors between the kept cells, along with
+        the number of cells filled. If passed, towards (one byte per cell, all 0) gets the
+        direction every filled cell was filled towards, i.e. its last way out. That stays 0
+        for the last cell filled of a part of the maze without any loops.
+        """
+        self.load_cells()
+        size, step, observer = self.M * self.N, self.steps(), self.observer
+        pruned: bytearray = bytearray(bytes(self.adjacency()))
+        degree: bytearray = bytearray(pruned.translate(_OPEN_COUNT))
+        flags: bytearray = bytearray(degree.translate(_SINGLE_OPENING))
+        for idx in keep:
+            # Kept cells are out of reach of ever getting down to a single way out
+            flags[idx], degree[idx] = 0, 255
+        deadends: list[int] = list(itertools.compress(range(size), flags))
+        self.stats.count(dead_ends=len(deadends))
+
+        filled = 0
         while deadends:
-            cx, cy = deadends.pop()
-            neighbours = list(filter(lambda x: not self.has_wall(cx, cy, x[0], x[1]) and x not in non_path, self.get_neighbours(cx, cy)))
-            non_path.add((cx, cy))
-            while len(neighbours) == 1:
-                non_path.add((cx, cy))
-                cx, cy = neighbours.pop()
-                if (cx, cy) != source and (cx, cy) != destination:
-                    neighbours = list(filter(lambda x: not self.has_wall(cx, cy, x[0], x[1]) and x not in non_path, self.get_neighbours(cx, cy)))
-
-        # Color only cells that are not in non path
-        for i in range(self.M):
-            for j in range(self.N):
-                if (i, j) not in non_path:
-                    self.grid[i][j].visited = True
+            curr = deadends.pop()
+            filled += 1
+            if observer:
+                observer("fill", curr, 0)
+            if towards is not None:
+                towards[curr] = pruned[curr]
+            for bit in WALL_BITS[pruned[curr]]:
+                nxt = curr + step[bit]
+                pruned[nxt] &= ~OPPOSITE[bit]
+                degree[nxt] -= 1
+                if degree[nxt] == 1:
+                    deadends.append(nxt)
+            pruned[curr] = 0
+        self.stats.count(filled=filled)
+        return bytes(pruned), filled
+
+    def solve_dead_end_filling(self, source: tuple[int, int], destination: tuple[int, int]) -> tuple[list[int], int]:
+        """
+        Step 1: Fill in all dead ends other than source and destination (see `fill_dead_ends`).
+        The cells that are left either lie on a path from source to destination or on a loop.
+
+        Step 2: BFS from source to destination through the cells that are left, which in a
+        perfect maze is just the solution itself.
+        """
+        with self.stats.phase("fill_dead_ends"):
+            pruned, filled = self.fill_dead_ends((self.index(*source), self.index(*destination)))
+        path, expanded = self.solve_DFS_BFS(source, destination, adjacency=pruned)
+        return path, expanded + filled
+
+    def distance_field(self, destination: tuple[int, int]) -> tuple[typing.Sequence[int], bytearray]:
+        """
+        BFS outwards from destination, returns the distance of every cell to destination
+        and the direction (wall bit) to step in from every cell to get one cell closer.
+        Computed lazily and cached until the walls next change or another destination is asked for.
+        """
+        dest = self.index(*destination)
+        cached = self._distance_field
+        if cached is not None and cached[:2] == (self.revision, dest):
+            return cached[2], cached[3]
+
+        self.load_cells()
+        adjacency, step, observer = self.adjacency(), self.steps(), self.observer
+        distances: array.array[int] = array.array('i', [UNREACHABLE]) * (self.M * self.N)
+        towards: bytearray = bytearray(self.M * self.N)
+        distances[dest] = 0
+        to_visit: collections.deque[int] = collections.deque([dest])
+        with self.stats.phase("distance_field"):
+            while to_visit:
+                curr = to_visit.popleft()
+                if observer:
+                    observer("expand", curr, 0)
+                for bit in WALL_BITS[adjacency[curr]]:
+                    nxt = curr + step[bit]
+                    if distances[nxt] == UNREACHABLE:
+                        distances[nxt] = distances[curr] + 1
+                        towards[nxt] = OPPOSITE[bit]
+                        to_visit.append(nxt)
+        self.stats.count(field_cells=self.M * self.N - distances.count(UNREACHABLE))
+
+        self._distance_field = (self.revision, dest, distances, towards)
+        return distances, towards
+
+    def path_to(self, source: tuple[int, int], destination: tuple[int, int]) -> list[int]:
+        """
+        Shortest path from source to destination as flat cell indices, found by
+        simply following the cached distance field, i.e. in O(path length).
+        Empty if destination can't be reached from source.
+        """
+        distances, towards = self.distance_field(destination)
+        curr, step = self.index(*source), self.steps()
+        if distances[curr] == UNREACHABLE:
+            return []
+        path: list[int] = [curr]
+        while distances[curr]:
+            curr += step[towards[curr]]
+            path.append(curr)
+        return path
+
+    def solve_distance_field(self, source: tuple[int, int], destination: tuple[int, int]) -> tuple[list[int], int]:
+        """
+        Path from source following the cached distance field of destination. Counts the cells
+        walked, plus every cell reachable from destination if the field was built for this query.
+        """
+        cached = self._distance_field
+        built = cached is None or cached[:2] != (self.revision, self.index(*destination))
+        path = self.path_to(source, destination)
+        if not built:
+            return path, len(path)
+        distances, _ = self.distance_field(destination)
+        return path, len(path) + len(distances) - distances.count(UNREACHABLE)
+
+    def solve_bidirectional_BFS(self, source: tuple[int, int], destination: tuple[int, int], adjacency: bytes | PackedWalls | None = None) -> tuple[list[int], int]:
+        """
+        Step 1: Run two BFS at once, one from the source and one from the destination.
+
+        Step 2: Always expand a full level of whichever side has the smaller frontier.
+
+        Step 3: While expanding a level, every open neighbour already reached by the other
+        side closes a path. Once the level is done, keep the shortest of these paths.
+        Since levels are expanded whole, no shorter path can show up later.
+
+        Step 4: Mark the path, from the meeting point back to each end.
+        """
+        adjacency, step = self.adjacency() if adjacency is None else adjacency, self.steps()
+        src, dest = self.index(*source), self.index(*destination)
+        size = self.M * self.N
+
+        # Distance and previous cell from either end, index 0 is the source side
+        distances = [array.array('i', [UNREACHABLE]) * size, array.array('i', [UNREACHABLE]) * size]
+        prev_visited = [array.array('i', [-1]) * size, array.array('i', [-1]) * size]
+        frontiers: list[list[int]] = [[src], [dest]]
+        distances[0][src], distances[1][dest] = 0, 0
+        expanded, best, meeting = 0, UNREACHABLE, (src, src)
+        observer, levels = self.observer, 0
+        if src == dest:
+            return [src], expanded
+        while best == UNREACHABLE and frontiers[0] and frontiers[1]:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            dist, other, prev = distances[side], distances[1 - side], prev_visited[side]
+            level: list[int] = []
+            for curr in frontiers[side]:
+                expanded += 1
+                if observer:
+                    observer("expand", curr, 0)
+                for bit in WALL_BITS[adjacency[curr]]:
+                    nxt = curr + step[bit]
+                    if other[nxt] != UNREACHABLE and dist[curr] + 1 + other[nxt] < best:
+                        best = dist[curr] + 1 + other[nxt]
+                        meeting = (curr, nxt) if side == 0 else (nxt, curr)
+                    if dist[nxt] == UNREACHABLE:
+                        dist[nxt] = dist[curr] + 1
+                        prev[nxt] = curr
+                        level.append(nxt)
+            frontiers[side] = level
+            levels += 1
+        self.stats.count(levels=levels)
+
+        if best == UNREACHABLE:
+            return [], expanded
+        return self.meeting_path(prev_visited, src, dest, meeting), expanded
+
+    def solve_bidirectional_a_star(self, source: tuple[int, int], destination: tuple[int, int], adjacency: bytes | PackedWalls | None = None) -> tuple[list[int], int]:
+        """
+        A* from both ends at once, the forward search heads for the destination and the
+        backward search heads for the source, each with its own manhattan heuristic.
+        Nodes are prioritized by `max(G + H, 2 * G)` so both searches meet in the middle (MM).
+
+        Step 1: Expand the side with the lowest priority on top of its heap, exactly as in A*.
+
+        Step 2: Relaxing an edge onto a node already reached by the other side closes a path,
+        keep track of the shortest (`best`) found so far.
+
+        Step 3: Stop once the lowest priority on both heaps is no lower than `best`. That
+        priority is a lower bound on the length of any path not yet found.
+        """
+        adjacency, step, N = self.adjacency() if adjacency is None else adjacency, self.steps(), self.N
+        src, dest = self.index(*source), self.index(*destination)
+        size = self.M * self.N
+        targets = [destination, source]
+        heuristic: typing.Callable[[int, int], int] = lambda x, side: abs(x // N - targets[side][0]) + abs(x % N - targets[side][1])
+
+        distances = [array.array('i', [UNREACHABLE]) * size, array.array('i', [UNREACHABLE]) * size]
+        prev_visited = [array.array('i', [-1]) * size, array.array('i', [-1]) * size]
+        heaps: list[list[tuple[int, int, int]]] = [[(heuristic(src, 0), 0, src)], [(heuristic(dest, 1), 0, dest)]]
+        distances[0][src], distances[1][dest] = 0, 0
+        expanded, best, meeting = 0, UNREACHABLE, (src, src)
+        observer, stale = self.observer, 0
+        if src == dest:
+            return [src], expanded
+        while heaps[0] and heaps[1] and min(heaps[0][0][0], heaps[1][0][0]) < best:
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            dist, other, prev, heap = distances[side], distances[1 - side], prev_visited[side], heaps[side]
+            _, cost, curr = heapq.heappop(heap)
+            if cost > dist[curr]:
+                stale += 1
+                continue
+            expanded += 1
+            if observer:
+                observer("expand", curr, 0)
+            for bit in WALL_BITS[adjacency[curr]]:
+                nxt = curr + step[bit]
+                if dist[nxt] > cost + 1:
+                    dist[nxt] = cost + 1
+                    prev[nxt] = curr
+                    heapq.heappush(heap, (max(heuristic(nxt, side) + cost + 1, 2 * (cost + 1)), cost + 1, nxt))
+                if other[nxt] != UNREACHABLE and cost + 1 + other[nxt] < best:
+                    best = cost + 1 + other[nxt]
+                    meeting = (curr, nxt) if side == 0 else (nxt, curr)
+        self.count_heap(expanded, stale, len(heaps[0]) + len(heaps[1]), False)
+
+        if best == UNREACHABLE:
+            return [], expanded
+        return self.meeting_path(prev_visited, src, dest, meeting), expanded
+
+    def replanner(self, destination: tuple[int, int]) -> "Replanner":
+        """
+        Incremental planner towards destination, kept on the maze until a planner towards
+        another destination is asked for. It carries its search over between queries and
+        gets told about every wall broken or built through `break_wall` / `build_wall`.
+        Only the most recent one is kept, each holds two arrays the size of the maze.
+        """
+        if self._replanner is None or self._replanner.destination != self.index(*destination):
+            self._replanner = Replanner(self, destination)
+        return self._replanner
+
+    def tree_index(self) -> "TreeIndex":
+        """
+        Index answering path queries on a perfect maze without searching, built lazily
+        and rebuilt on the first query after the walls change
+        """
+        if self._tree_index is None or self._tree_index.revision != self.revision:
+            with self.stats.phase("tree_index"):
+                self._tree_index = TreeIndex(self)
+        return self._tree_index
+
+    def junction_graph(self) -> "JunctionGraph":
+        """
+        Maze contracted down to its junctions, built lazily and rebuilt
+        on the first query after the walls change
+        """
+        if self._junction_graph is None or self._junction_graph.revision != self.revision:
+            with self.stats.phase("junction_graph"):
+                self._junction_graph = JunctionGraph(self)
+            self.stats.count(junctions=len(self._junction_graph.junctions), corridors=len(self._junction_graph.edges))
+        return self._junction_graph
+
+    def count_heap(self, expanded: int, stale: int, left: int, found: bool) -> None:
+        """
+        Heap traffic of a search, derived from what it counts anyway. Every pop either
+        expanded a node, skipped a stale entry or hit the destination, and every push
+        was either popped or is still left on the heap.
+        """
+        pops = expanded + stale + found
+        self.stats.count(heap_pushes=pops + left, heap_pops=pops, stale=stale)
+
+    def meeting_path(self, prev_visited: typing.Sequence[typing.Sequence[int]], source: int, destination: int, meeting: tuple[int, int]) -> list[int]:
+        """
+        Path found by a bidirectional search. `meeting` is the edge where both searches
+        met, its first cell was reached from source and its second from destination.
+        """
+        return self.trace_path(prev_visited[0], source, meeting[0]) + self.trace_path(prev_visited[1], destination, meeting[1])[::-1]
+
+    def trace_path(self, prev_visited: typing.Sequence[int], source: int, destination: int) -> list[int]:
+        """
+        Path from source to destination, traced back from destination. Empty if unreachable.
+        """
+        if destination != source and prev_visited[destination] == -1:
+            return []
+        curr, path = destination, [destination]
+        with self.stats.phase("trace"):
+            while curr != source:
+                curr = prev_visited[curr]
+                path.append(curr)
+        return path[::-1]
+
+    def board_codes(self) -> bytearray:
+        """
+        Builds the (2M + 1) x (2N + 1) board as a flat buffer of render codes in batch.
+        Each translate / big int operation below works on the whole maze at once,
+        Python level work is limited to a couple of slice assignments per row.
+        """
+        M, N, W = self.M, self.N, 2 * self.N + 1
+        cells = bytes(self.cells)
+
+        # Code for every cell and a marker (spare bit 5) for visited cells
+        cell_codes = cells.translate(_CELL_CODES)
+        visited_marks = int.from_bytes(cells.translate(_VISITED_MARKS), "big")
+
+        # Shift visited marks to line up with the cell to the left / above
+        # Last column / row always has a wall so whatever wraps around is ignored
+        cells_int = int.from_bytes(cells, "big")
+        right_codes = (cells_int | (visited_marks << 8)).to_bytes(M * N + 1, "big")[1:].translate(_RIGHT_CODES)
+        down_codes = (cells_int | (visited_marks << (8 * N))).to_bytes(M * N + N, "big")[N:].translate(_DOWN_CODES)
+
+        # Stitch rows together, corners and borders default to walls
+        codes = bytearray(W * (2 * M + 1))
+        for i in range(M):
+            start = (2 * i + 1) * W
+            codes[start + 1: start + W: 2] = cell_codes[i * N: (i + 1) * N]
+            codes[start + 2: start + W: 2] = right_codes[i * N: (i + 1) * N]
+            codes[start + W + 1: start + 2 * W: 2] = down_codes[i * N: (i + 1) * N]
+
+        return codes
+
+    def render(self, glyphs: type[COLORS] | type[ASCII_COLORS] = COLORS) -> list[str]:
+        """
+        Renders the maze as one ready made string per row of the board
+        """
+        codes, W = self.board_codes().decode("latin-1"), 2 * self.N + 1
+        table = {_WALL_CODE: glyphs.wall.value, _VISITED_CODE: glyphs.visited.value, _EMPTY_CODE: glyphs.empty.value}
+        return [codes[i: i + W].translate(table) for i in range(0, len(codes), W)]
 
     @property
     def board(self) -> list[list[str]]:
         """
         Logic to convert the maze into a more print friendly version
         """
-        results: list[list[str]] = [[]]
-        for i in range(2 * self.M + 1):
-            for j in range(2 * self.N + 1):
-                # If both are even, definitely wall
-                if i % 2 == 0 and j % 2 == 0:
-                    results[-1].append(COLORS.wall.value)
-                # If both are odd definitely free cell
-                elif i % 2 == 1 and j % 2 == 1:
-                    results[-1].append(COLORS.visited.value if self.grid[i // 2][j // 2].visited else COLORS.empty.value)
-                else:
-                    # Horizontal wall
-                    if i % 2 == 0:
-                        (ux, uy), (lx, ly) = ((i + 1) // 2, j // 2), ((i - 1) // 2, j // 2)
-                        upper_cell_lower_wall = self.grid[lx][ly].wall.down if 0 <= lx < self.M else True
-                        lower_cell_upper_wall = self.grid[ux][uy].wall.up if 0 <= ux < self.M else True
-                        assert upper_cell_lower_wall == lower_cell_upper_wall, "walls not updated correctly"
-                        results[-1].append(COLORS.wall.value if upper_cell_lower_wall else COLORS.visited.value if self.grid[lx][ly].visited and self.grid[ux][uy].visited else COLORS.empty.value)
-                    # Vertical wall
-                    else:
-                        (rx, ry), (lx, ly) = (i // 2, (j + 1) // 2), (i // 2, (j - 1) // 2)
-                        right_cell_left_wall = self.grid[rx][ry].wall.left if 0 <= ry < self.N else True
-                        left_cell_right_wall = self.grid[lx][ly].wall.right if 0 <= ly < self.N else True
-                        assert right_cell_left_wall == left_cell_right_wall, "walls not updated correctly"
-                        results[-1].append(COLORS.wall.value if right_cell_left_wall else COLORS.visited.value if self.grid[lx][ly].visited and self.grid[rx][ry].visited else COLORS.empty.value)
-            results.append([])
-
-        # Remove the last empty list we would have added
-        results.pop()
-
-        return results
-
-    def print(self) -> None:
+        codes, W = self.board_codes(), 2 * self.N + 1
+        lookup = (COLORS.wall.value, COLORS.visited.value, COLORS.empty.value)
+        return [[lookup[code] for code in codes[i: i + W]] for i in range(0, len(codes), W)]
+
+    def print(self, glyphs: type[COLORS] | type[ASCII_COLORS] = COLORS) -> None:
         """
         Logic to print the maze to the console
         """
-        display_matrix: list[list[str]] = self.board
-        for i in range(len(display_matrix)):
-            for j in range(len(display_matrix[0])):
-                print(display_matrix[i][j], end="")
-            print()
+        sys.stdout.write("\n".join(self.render(glyphs)) + "\n")
+
+    def to_bytes(self) -> bytes:
+        """
+        The maze in the packed binary format (see `_FILE_HEADER`), visited marks are not kept
+        """
+        if self._cells is None and self.packed_walls is not None:
+            packed = self.packed_walls.packed()
+        else:
+            packed = pack_codes(self.cells.translate(_PACK_CODES))
+        name = self.algorithm.encode()
+        flags = (_MULTIPLE_PATHS_FLAG if self.multiple_paths else 0) | (_DEAD_ENDS_FLAG if self.braid.mode == "dead_ends" else 0) | (_SEED_FLAG if self.seed is not None else 0)
+        header = _FILE_HEADER.pack(_FILE_MAGIC, _FILE_VERSION, flags, len(name), self.M, self.N, self.seed or 0, self.braid.amount)
+        return header + name + packed
+
+    def save(self, path: str) -> None:
+        """
+        Writes the maze to a file in the packed binary format
+        """
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str, observer: Observer | None = None) -> "Maze":
+        """
+        Opens a maze written by `save`. The file is memory mapped and read as needed:
+        `has_wall` and the solvers stepping from cell to cell look walls up straight off
+        the file, anything needing the whole maze (rendering, changing walls, dead end
+        filling, ...) reads it into `cells` in one go first.
+        """
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_buffer(buffer, 0, observer, path)
+
+    @classmethod
+    def from_buffer(cls, buffer: mmap.mmap | bytes, offset: int = 0, observer: Observer | None = None, name: str = "buffer") -> "Maze":
+        """
+        Maze in the packed binary format starting at offset within a buffer. Walls are
+        looked up in the buffer until needed in whole, `maze.packed_walls.end` is where it ends.
+        """
+        if len(buffer) < offset + _FILE_HEADERS[1].size or buffer[offset: offset + len(_FILE_MAGIC)] != _FILE_MAGIC:
+            raise ValueError(f"{name} is not a maze file")
+        version = buffer[offset + len(_FILE_MAGIC)]
+        if version not in _FILE_HEADERS:
+            raise ValueError(f"{name} has unsupported format version {version}")
+        header = _FILE_HEADERS[version]
+        if len(buffer) < offset + header.size:
+            raise ValueError(f"{name} is truncated")
+        _, _, flags, length, M, N, seed, *amount = header.unpack_from(buffer, offset)
+        braid = Braid("dead_ends" if flags & _DEAD_ENDS_FLAG else "density", amount[0]) if amount else Braid()
+        has_seed = seed != -1 if version < 3 else bool(flags & _SEED_FLAG)
+        start = offset + header.size + length
+        if len(buffer) < start + (M * N + 3) // 4:
+            raise ValueError(f"{name} is truncated")
+
+        maze = cls.__new__(cls)
+        maze.init_state(M, N, bytes(buffer[start - length: start]).decode(), bool(flags & _MULTIPLE_PATHS_FLAG), seed if has_seed else None, observer, braid)
+        maze.packed_walls = PackedWalls(buffer, start, M, N)
+        return maze
+
+    def load_cells(self) -> None:
+        """
+        Reads the walls of a loaded maze into `cells` in batch, no-op if they are already
+        there. The neighbouring walls are lined up from the unpacked codes as in `carve`.
+        """
+        if self._cells is not None or self.packed_walls is None:
+            return
+        size = self.M * self.N
+        openings = unpack_codes(self.packed_walls.packed(), size).translate(_CODE_OPENINGS)
+        _, opened = self.opened_walls(openings)
+        # The same walls as on file, so anything compiled from them stays valid
+        self._cells, self.packed_walls = bytearray((int.from_bytes(bytes([ALL_WALLS]) * size, "big") & ~opened).to_bytes(size, "big")), None
+
+class BoardView:
+    """
+    Lazy view of the (2M + 1) x (2N + 1) board of a maze (see `Maze.board`), indexed by
+    board position `view[i, j]`. Every glyph is worked out from the walls of at most two
+    cells when asked for, so reading a window of the board costs the size of the window
+    rather than the maze, and a maze loaded from a file is read straight off the file.
+    Glyphs can be painted over positions (e.g. a hint) without touching the maze.
+    """
+    def __init__(self, maze: Maze, glyphs: type[COLORS] | type[ASCII_COLORS] = COLORS) -> None:
+        self.maze = maze
+        self.rows, self.cols = 2 * maze.M + 1, 2 * maze.N + 1
+        self.lookup = (glyphs.wall.value, glyphs.visited.value, glyphs.empty.value)
+        self.painted: dict[tuple[int, int], str] = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, position: tuple[int, int]) -> str:
+        glyph = self.painted.get(position)
+        return glyph if glyph is not None else self.lookup[self.code(*position)]
+
+    def __setitem__(self, position: tuple[int, int], glyph: str) -> None:
+        self.painted[position] = glyph
+
+    def __delitem__(self, position: tuple[int, int]) -> None:
+        self.painted.pop(position, None)
+
+    def code(self, i: int, j: int) -> int:
+        """
+        Render code of a board position, the same as in `Maze.board_codes`. Odd rows and
+        columns hold cells, the positions in between hold the walls separating them and
+        corners (and anything off the board) are always walls.
+        """
+        if not (0 < i < self.rows - 1 and 0 < j < self.cols - 1) or not (i & 1 or j & 1):
+            return _WALL_CODE
+        N = self.maze.N
+        idx = (i - 1) // 2 * N + (j - 1) // 2
+        if i & 1 and j & 1:
+            return _VISITED_CODE if self.visited(idx) else _EMPTY_CODE
+        bit = RIGHT if i & 1 else DOWN
+        if not self.opened(idx, bit):
+            return _WALL_CODE
+        return _VISITED_CODE if self.visited(idx) and self.visited(idx + (1 if bit == RIGHT else N)) else _EMPTY_CODE
+
+    def opened(self, idx: int, bit: int) -> bool:
+        # Read the one wall asked for, like `Maze.has_wall`, rather than compiling the whole maze
+        maze = self.maze
+        if maze._cells is None and maze.packed_walls is not None:
+            return bool(maze.packed_walls[idx] & bit)
+        return not maze.cells[idx] & bit
+
+    def visited(self, idx: int) -> bool:
+        # A maze whose walls are still packed in a file has no visited marks yet
+        return self.maze.packed_walls is None and bool(self.maze.cells[idx] & VISITED)
+
+    def row(self, i: int, start: int, stop: int) -> str:
+        """
+        Glyphs of row i from column start upto stop, clipped to the board
+        """
+        return "".join([self[i, j] for j in range(max(start, 0), min(stop, self.cols))])
+
+class JunctionGraph:
+    """
+    Weighted graph of the junctions of a maze.
+
+    Step 1: Prune dead ends. Repeatedly remove cells with a single open neighbour left, every
+    removed cell remembers the direction it was removed towards. What remains is the core of
+    the maze: cells that lie on a loop or between loops. A perfect maze prunes down to one cell.
+
+    Step 2: Core cells with anything other than two core neighbours are junctions. Every
+    corridor of two-neighbour cells between junctions becomes a single edge weighted with its
+    length. A loop without any junction on it gets one of its cells promoted to a junction.
+
+    Step 3: To answer a query, walk source and destination up their pruned branches to the core,
+    search the junction graph from the junctions (or corridor ends) there and expand the edges
+    of the result back into cells.
+    """
+
+    def __init__(self, maze: Maze) -> None:
+        self.maze, self.revision = maze, maze.revision
+        maze.load_cells()
+        self.step, size, observer = maze.steps(), maze.M * maze.N, maze.observer
+
+        # Step 1: Prune dead ends (see `Maze.fill_dead_ends`), leaving the direction towards
+        # the core behind. Cells filled towards nothing are the last of a part without
+        # loops, they stay in the core so that every part keeps a cell of its own.
+        self.towards_core: bytearray = bytearray(size)
+        self.pruned, _ = maze.fill_dead_ends(towards=self.towards_core)
+        self.core: bytearray = bytearray(self.towards_core.translate(_IS_ZERO))
+        degree: bytearray = bytearray(self.pruned.translate(_OPEN_COUNT))
+
+        # Step 2: Junctions are the nodes, corridors between them the edges. Every corridor
+        # cell knows which edge it is on and how far along it from the first junction
+        self.node_of: array.array[int] = array.array('i', [-1]) * size
+        self.edge_of: array.array[int] = array.array('i', [-1]) * size
+        self.offset_of: array.array[int] = array.array('i', [0]) * size
+        self.junctions: list[int] = []
+        self.edges: list[tuple[int, int, int, int]] = []
+        self.incident: list[list[int]] = []
+        self.degree = degree
+        for idx in range(size):
+            if self.core[idx] and degree[idx] != 2:
+                self.add_junction(idx)
+        for start in range(0, len(self.junctions), CHECKPOINT):
+            for node in range(start, min(start + CHECKPOINT, len(self.junctions))):
+                self.add_corridors(node)
+            if observer:
+                observer("progress", min(CHECKPOINT, len(self.junctions) - start), 0)
+        for idx in range(size):
+            if self.core[idx] and self.node_of[idx] == -1 and self.edge_of[idx] == -1:
+                self.add_corridors(self.add_junction(idx))
+
+    def add_junction(self, idx: int) -> int:
+        self.node_of[idx] = len(self.junctions)
+        self.junctions.append(idx)
+        self.incident.append([])
+        return self.node_of[idx]
+
+    def core_directions(self, idx: int) -> tuple[int, ...]:
+        return WALL_BITS[self.pruned[idx]]
+
+    def add_corridors(self, node: int) -> None:
+        """
+        Walks every corridor leaving a junction that hasn't been walked yet (from its other end)
+        """
+        start = self.junctions[node]
+        for bit in self.core_directions(start):
+            prev, curr, length = start, start + self.step[bit], 1
+            if self.edge_of[curr] != -1 or (self.node_of[curr] != -1 and self.node_of[curr] < node):
+                continue
+            edge = len(self.edges)
+            while self.node_of[curr] == -1:
+                self.edge_of[curr], self.offset_of[curr] = edge, length
+                prev, curr = curr, next(curr + self.step[b] for b in self.core_directions(curr) if curr + self.step[b] != prev)
+                length += 1
+            self.edges.append((node, self.node_of[curr], length, bit))
+            self.incident[node].append(edge)
+            if self.node_of[curr] != node:
+                self.incident[self.node_of[curr]].append(edge)
+
+    def corridor(self, edge: int) -> list[int]:
+        """
+        Cells of an edge, from its first junction to its second (both included)
+        """
+        node, _, length, bit = self.edges[edge]
+        prev, curr = self.junctions[node], self.junctions[node] + self.step[bit]
+        cells = [prev]
+        for _ in range(length - 1):
+            cells.append(curr)
+            prev, curr = curr, next(curr + self.step[b] for b in self.core_directions(curr) if curr + self.step[b] != prev)
+        cells.append(curr)
+        return cells
+
+    def to_core(self, idx: int) -> list[int]:
+        """
+        Cells from idx up its pruned branch until the first core cell (included)
+        """
+        cells = [idx]
+        while not self.core[idx]:
+            idx += self.step[self.towards_core[idx]]
+            cells.append(idx)
+        return cells
+
+    def entries(self, idx: int) -> dict[int, tuple[int, int]]:
+        """
+        Junctions to enter the graph at from a core cell, with the distance to each
+        and the end of the corridor (0 for its first junction, 1 for its second)
+        """
+        if self.node_of[idx] != -1:
+            return {self.node_of[idx]: (0, 0)}
+        first, second, length, _ = self.edges[self.edge_of[idx]]
+        entries = {second: (length - self.offset_of[idx], 1)}
+        if first not in entries or self.offset_of[idx] < entries[first][0]:
+            entries[first] = (self.offset_of[idx], 0)
+        return entries
+
+    def segment(self, idx: int, end: int) -> list[int]:
+        """
+        Cells from a junction at the given end of the corridor of idx up to idx (both included)
+        """
+        if self.node_of[idx] != -1:
+            return [idx]
+        corridor = self.corridor(self.edge_of[idx])
+        return corridor[:self.offset_of[idx] + 1] if end == 0 else corridor[self.offset_of[idx]:][::-1]
+
+    def path(self, source: int, destination: int, use_heuristic: bool = False) -> tuple[list[int], int]:
+        """
+        Shortest path between two cells expanded back into cells, along with the
+        number of junctions expanded. Empty if destination can't be reached.
+        """
+        head, tail = self.to_core(source), self.to_core(destination)
+
+        # Both ends on the same pruned branch (or hanging off the same core cell)
+        on_head = {idx: pos for pos, idx in enumerate(head)}
+        for pos, idx in enumerate(tail):
+            if idx in on_head:
+                return head[:on_head[idx]] + tail[pos::-1], 0
+        src, dest = head[-1], tail[-1]
+
+        # Dijkstra / A* over the junctions, the virtual node -1 stands for the core cell of destination
+        N, (dx, dy), exits = self.maze.N, divmod(dest, self.maze.N), self.entries(dest)
+        heuristic: typing.Callable[[int], int] = lambda x: abs(x // N - dx) + abs(x % N - dy) if use_heuristic and x != -1 else 0
+        distances: dict[int, int] = {}
+        prev_visited: dict[int, tuple[int, int]] = {}
+        heap: list[tuple[int, int, int]] = []
+        for node, (cost, end) in self.entries(src).items():
+            distances[node], prev_visited[node] = cost, (-2, end)
+            heapq.heappush(heap, (cost + heuristic(self.junctions[node]), cost, node))
+
+        # Both ends on the same corridor, walking straight along it is one option
+        if self.edge_of[src] != -1 and self.edge_of[src] == self.edge_of[dest]:
+            distances[-1], prev_visited[-1] = abs(self.offset_of[src] - self.offset_of[dest]), (-2, -1)
+            heapq.heappush(heap, (distances[-1], distances[-1], -1))
+
+        observer, expanded = self.maze.observer, 0
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == -1:
+                break
+            if cost > distances[node]:
+                continue
+            expanded += 1
+            if observer:
+                observer("expand", self.junctions[node], 0)
+            candidates = [(edge, self.edges[edge][1] if self.edges[edge][0] == node else self.edges[edge][0], self.edges[edge][2]) for edge in self.incident[node]]
+            if node in exits:
+                candidates.append((-1, -1, exits[node][0]))
+            for edge, nxt, length in candidates:
+                if cost + length < distances.get(nxt, UNREACHABLE):
+                    distances[nxt], prev_visited[nxt] = cost + length, (node, edge)
+                    heapq.heappush(heap, (cost + length + heuristic(self.junctions[nxt] if nxt != -1 else -1), cost + length, nxt))
+
+        if -1 not in distances:
+            return [], expanded
+
+        # Expand the junctions back into cells, walking backwards from destination
+        node, edge = prev_visited[-1]
+        if node == -2:
+            corridor = self.corridor(self.edge_of[src])
+            start, end = self.offset_of[src], self.offset_of[dest]
+            cells = corridor[start: end + 1] if start <= end else corridor[end: start + 1][::-1]
+        else:
+            cells = self.segment(dest, exits[node][1])
+            while prev_visited[node][0] != -2:
+                prev, edge = prev_visited[node]
+                corridor = self.corridor(edge)
+                cells = (corridor if corridor[0] == self.junctions[prev] else corridor[::-1]) + cells[1:]
+                node = prev
+            cells = self.segment(src, prev_visited[node][1])[::-1] + cells[1:]
+        return head[:-1] + cells + tail[-2::-1], expanded
+
+class TreeIndex:
+    """
+    Path index of a perfect maze. Its open walls form a spanning tree, so the path between
+    any two cells is unique: up from both cells to their lowest common ancestor (LCA) in the
+    tree rooted at the first cell, which is found without searching in O(log n).
+
+    Step 1: BFS from the root for the parent and depth of every cell.
+
+    Step 2: Along with its parent every cell gets a jump pointer further up the tree, set in
+    O(1) from the pointers of its parent so that jumps double up like in binary lifting
+    (skew binary jump pointers). Reaching any ancestor takes O(log n) jumps, with just one
+    pointer per cell rather than a table of log n of them.
+
+    Cells are flat indices (`x * N + y`) throughout.
+    """
+
+    def __init__(self, maze: Maze) -> None:
+        self.maze, self.revision = maze, maze.revision
+        maze.load_cells()
+        adjacency, step, size, observer = typing.cast(bytes, maze.adjacency()), maze.steps(), maze.M * maze.N, maze.observer
+        if sum(adjacency.translate(_OPEN_COUNT)) != 2 * (size - 1):
+            raise ValueError("Maze has loops, only a perfect maze can be indexed as a tree")
+
+        self.parent: array.array[int] = array.array('i', [-1]) * size
+        self.jump: array.array[int] = array.array('i', [0]) * size
+        self.depth: array.array[int] = array.array('i', [0]) * size
+        parent, jump, depth = self.parent, self.jump, self.depth
+        parent[0] = 0
+        order: list[int] = [0]
+        for curr in order:
+            # Children jump twice as far as the parent did once its jump
+            # matches the jump after it, and to the parent otherwise
+            up = jump[curr]
+            up = jump[up] if depth[curr] - depth[up] == depth[up] - depth[jump[up]] else curr
+            if observer:
+                observer("expand", curr, 0)
+            for bit in WALL_BITS[adjacency[curr]]:
+                nxt = curr + step[bit]
+                if parent[nxt] == -1:
+                    parent[nxt], jump[nxt], depth[nxt] = curr, up, depth[curr] + 1
+                    order.append(nxt)
+        if len(order) != size:
+            raise ValueError("Maze is not connected, only a perfect maze can be indexed as a tree")
+
+    def ancestor(self, idx: int, depth: int) -> int:
+        """
+        Ancestor of a cell at the given depth, jumping wherever that doesn't overshoot
+        """
+        parent, jump, depths = self.parent, self.jump, self.depth
+        while depths[idx] > depth:
+            idx = jump[idx] if depths[jump[idx]] >= depth else parent[idx]
+        return idx
+
+    def lca(self, u: int, v: int) -> int:
+        """
+        Lift the deeper cell to the depth of the other one, then lift both together.
+        Cells at the same depth have jumps of the same length, so they jump together
+        wherever that keeps them apart and step up to the parent otherwise.
+        """
+        parent, jump, depth = self.parent, self.jump, self.depth
+        if depth[u] < depth[v]:
+            u, v = v, u
+        u = self.ancestor(u, depth[v])
+        while u != v:
+            if jump[u] != jump[v]:
+                u, v = jump[u], jump[v]
+            else:
+                u, v = parent[u], parent[v]
+        return u
+
+    def distance(self, u: int, v: int) -> int:
+        depth = self.depth
+        return depth[u] + depth[v] - 2 * depth[self.lca(u, v)]
+
+    def next_step(self, u: int, v: int) -> int:
+        """
+        Cell to step to from u on the way to v (u itself if they are the same): the parent
+        of u unless u is an ancestor of v, in which case the way is down towards v
+        """
+        if u == v:
+            return u
+        if self.lca(u, v) != u:
+            return self.parent[u]
+        return self.ancestor(v, self.depth[u] + 1)
+
+    def path(self, u: int, v: int) -> list[int]:
+        """
+        Path from u to v, walked up from both ends to their lowest common ancestor in O(path length)
+        """
+        ancestor, parent = self.lca(u, v), self.parent
+        head: list[int] = []
+        while u != ancestor:
+            head.append(u)
+            u = parent[u]
+        tail: list[int] = []
+        while v != ancestor:
+            tail.append(v)
+            v = parent[v]
+        return head + [ancestor] + tail[::-1]
+
+    def distances(self, sources: typing.Sequence[int], destinations: typing.Sequence[int]) -> array.array:
+        """
+        Path lengths between every pair of sources and destinations
+        """
+        depth, lca = self.depth, self.lca
+        return array.array('i', [depth[u] + depth[v] - 2 * depth[lca(u, v)] for u, v in zip(sources, destinations)])
+
+    def next_steps(self, sources: typing.Sequence[int], destinations: typing.Sequence[int]) -> array.array:
+        """
+        Cell to step to from every source on the way to its destination
+        """
+        next_step = self.next_step
+        return array.array('i', [next_step(u, v) for u, v in zip(sources, destinations)])
+
+class Replanner:
+    """
+    Incremental planner (D* Lite) towards a fixed destination, attached to its maze
+    (see `Maze.replanner`) so that the search carries over from one query to the next.
+
+    Step 1: Search backwards from the destination. Every cell keeps g, its distance to the
+    destination as last settled, and rhs, one more than the least g of its open neighbours.
+    Cells where the two disagree are queued by distance plus the manhattan distance to the
+    source, and settled until the source is.
+
+    Step 2: When a wall breaks or gets built, only the two cells on either side have their
+    rhs looked at again. The repair spreads from there only as far as distances changed.
+
+    Step 3: When the source moves, the keys already queued (with heuristics towards the old
+    source) are kept comparable by adding the distance moved to every new key rather than
+    re-keying the queue.
+
+    The path is read off from the source by stepping to the neighbour with the least g.
+    Walls changed in batch (generating, `carve`, ...) can't be repaired piecemeal, the
+    planner starts over on the next query after those.
+    """
+
+    def __init__(self, maze: Maze, destination: tuple[int, int]) -> None:
+        self.maze, self.destination = maze, maze.index(*destination)
+        self.expanded = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drops all search state, every cell is as far as it gets and only the destination is queued
+        """
+        maze = self.maze
+        maze.load_cells()
+        size = maze.M * maze.N
+        self.revision, self.cells, self.step = maze.revision, maze.cells, maze.steps()
+        self.g: array.array[int] = array.array('i', [UNREACHABLE]) * size
+        self.rhs: array.array[int] = array.array('i', [UNREACHABLE]) * size
+        self.rhs[self.destination] = 0
+        self.heap: list[tuple[int, int, int]] = []
+        self.source: int | None = None
+        self.sx = self.sy = self.moved = 0
+
+    def heuristic(self, u: int, v: int) -> int:
+        N = self.maze.N
+        return abs(u // N - v // N) + abs(u % N - v % N)
+
+    def key(self, u: int) -> tuple[int, int]:
+        N, g, rhs = self.maze.N, self.g[u], self.rhs[u]
+        best = g if g < rhs else rhs
+        return best + abs(u // N - self.sx) + abs(u % N - self.sy) + self.moved, best
+
+    def update(self, u: int) -> None:
+        """
+        Works out rhs of a cell from its open neighbours again, and queues it if it no longer matches g
+        """
+        g, rhs = self.g, self.rhs
+        if u != self.destination:
+            step = self.step
+            best = min([g[u + step[bit]] for bit in WALL_BITS[_OPEN_DIRECTIONS[self.cells[u]]]], default=UNREACHABLE)
+            rhs[u] = best + 1 if best < UNREACHABLE else UNREACHABLE
+        if g[u] != rhs[u]:
+            heapq.heappush(self.heap, self.key(u) + (u,))
+
+    def wall_changed(self, u: int, v: int) -> None:
+        # Only a planner that has seen every change so far can repair its search,
+        # one that missed a batch change is left to start over on the next query
+        if self.revision != self.maze.revision - 1:
+            return
+        self.revision = self.maze.revision
+        if self.source is not None:
+            self.update(u)
+            self.update(v)
+
+    def path(self, source: tuple[int, int]) -> list[int]:
+        """
+        Shortest path from source to the destination as flat cell indices, empty if there
+        is none. Only what changed since the last query (walls, source) is searched again.
+        """
+        maze = self.maze
+        src = maze.index(*source)
+        if self.revision != maze.revision:
+            self.reset()
+        if self.source is None:
+            self.source, (self.sx, self.sy) = src, source
+            heapq.heappush(self.heap, self.key(self.destination) + (self.destination,))
+        elif src != self.source:
+            self.moved += self.heuristic(self.source, src)
+            self.source, (self.sx, self.sy) = src, source
+        self.compute()
+        return self.trace()
+
+    def compute(self) -> None:
+        """
+        Settles queued cells until the source is settled and nothing queued could still change it.
+        Entries left behind by later updates of a cell are skipped when they come up.
+        """
+        g, rhs, heap, src = self.g, self.rhs, self.heap, typing.cast(int, self.source)
+        cells, step, observer = self.cells, self.step, self.maze.observer
+        key, update = self.key, self.update
+        self.expanded = 0
+        while heap:
+            k1, k2, u = heap[0]
+            if g[src] == rhs[src] and (k1, k2) >= key(src):
+                break
+            heapq.heappop(heap)
+            if g[u] == rhs[u]:
+                continue
+            current = key(u)
+            if (k1, k2) < current:
+                heapq.heappush(heap, current + (u,))
+                continue
+
+            # Settle a cell that got closer, its neighbours can only get closer through it.
+            # Otherwise give up on the cell and look at it and its neighbours again
+            if g[u] > rhs[u]:
+                g[u] = rhs[u]
+                closer = g[u] + 1
+                for bit in WALL_BITS[_OPEN_DIRECTIONS[cells[u]]]:
+                    nxt = u + step[bit]
+                    if closer < rhs[nxt]:
+                        rhs[nxt] = closer
+                        if g[nxt] != closer:
+                            heapq.heappush(heap, key(nxt) + (nxt,))
+            else:
+                g[u] = UNREACHABLE
+                update(u)
+                for bit in WALL_BITS[_OPEN_DIRECTIONS[cells[u]]]:
+                    update(u + step[bit])
+            self.expanded += 1
+            if observer:
+                observer("expand", u, 0)
+
+    def trace(self) -> list[int]:
+        g, src = self.g, typing.cast(int, self.source)
+        if g[src] == UNREACHABLE:
+            return []
+        cells, step = self.cells, self.step
+        curr, path = src, [src]
+        while curr != self.destination:
+            curr = min([curr + step[bit] for bit in WALL_BITS[_OPEN_DIRECTIONS[cells[curr]]]], key=g.__getitem__)
+            path.append(curr)
+        return path
+
+def _generate_tile(spec: tuple[int, int, str, int]) -> bytes:
+    """
+    Worker for `Maze.generate_tiled`, generates a single perfect maze tile
+    """
+    rows, cols, algorithm, seed = spec
+    return bytes(Maze(rows, cols, algorithm, multiple_paths=False, seed=seed).cells)
 
 # +++++++++++++++++ MAIN FUNCTION +++++++++++++++++ #
 